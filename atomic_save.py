@@ -0,0 +1,156 @@
+import os
+import tempfile
+import threading
+
+# Níveis de durabilidade do salvamento:
+# - none: só renomeia o arquivo temporário (sem fsync)
+# - data: faz fsync dos dados do arquivo antes de renomear
+# - full: também faz fsync do diretório depois de renomear
+DURABILITY_NONE = 'none'
+DURABILITY_DATA = 'data'
+DURABILITY_FULL = 'full'
+DURABILITY_LEVELS = (DURABILITY_NONE, DURABILITY_DATA, DURABILITY_FULL)
+
+# O nível padrão pode ser ajustado por instalação, por exemplo em sistemas de
+# arquivos de rede onde o fsync é caro
+DEFAULT_DURABILITY = os.environ.get('ED_SAVE_DURABILITY', DURABILITY_DATA)
+if DEFAULT_DURABILITY not in DURABILITY_LEVELS:
+    DEFAULT_DURABILITY = DURABILITY_DATA
+
+# Permissões de um arquivo novo, como as que open() daria. A máscara é lida
+# uma vez: os.umask só consulta o valor trocando-o, o que não é seguro entre
+# threads
+UMASK = os.umask(0)
+os.umask(UMASK)
+NEW_FILE_MODE = 0o666 & ~UMASK
+
+def sync_file(f, durability):
+    """Garante que os dados do arquivo aberto chegaram ao disco"""
+    f.flush()
+    if durability == DURABILITY_NONE:
+        return
+    if durability == DURABILITY_DATA and hasattr(os, 'fdatasync'):
+        os.fdatasync(f.fileno())
+    else:
+        os.fsync(f.fileno())
+
+def sync_directory(directory):
+    """Grava no disco a entrada do diretório (renomeação)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return  # Sistemas sem suporte a abrir diretórios (Windows)
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+def atomic_write(path, write, durability=DEFAULT_DURABILITY, binary=False):
+    """
+    Grava um arquivo sem risco de deixá-lo truncado: write(f) escreve num
+    arquivo temporário no mesmo diretório, que depois substitui o original
+    numa única renomeação. Um link simbólico é seguido: o arquivo substituído
+    é o destino do link, como faria open().
+    """
+    path = os.path.realpath(path)
+    directory = os.path.dirname(path)
+    fd, temp_path = tempfile.mkstemp(prefix=f".{os.path.basename(path)}.", suffix='.tmp', dir=directory)
+    try:
+        if binary:
+            f = os.fdopen(fd, 'wb')
+        else:
+            f = os.fdopen(fd, 'w', encoding='utf-8')
+        with f:
+            write(f)
+            sync_file(f, durability)
+
+        # Mantém as permissões do arquivo original; o mkstemp cria com 0600
+        try:
+            mode = os.stat(path).st_mode & 0o7777
+        except FileNotFoundError:
+            mode = NEW_FILE_MODE
+        os.chmod(temp_path, mode)
+
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+    if durability == DURABILITY_FULL:
+        sync_directory(directory)
+
+class SaveRequest:
+    """Pedido agrupado à espera da gravação que o inclui"""
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.superseded = False  # Substituído por um pedido mais recente
+        self.error = None
+
+class Saver:
+    """
+    Agrupa pedidos de salvamento seguidos: se um arquivo já está sendo
+    gravado, um novo pedido para ele não inicia outra gravação em paralelo;
+    a gravação em curso é repetida uma única vez com o pedido mais recente.
+    Quem fez um pedido agrupado espera até essa repetição terminar.
+    """
+
+    def __init__(self, durability=DEFAULT_DURABILITY):
+        self.durability = durability
+        self.lock = threading.Lock()
+        self.active = set()  # Arquivos sendo gravados
+        self.pending = {}  # {arquivo: (write, binary, pedidos)} pedidos agrupados
+
+    def save(self, path, write, binary=False):
+        """Grava o arquivo e só retorna quando o conteúdo pedido (ou um mais
+        recente) está no disco; retorna False se um pedido mais recente
+        substituiu este antes de ser gravado"""
+        path = os.path.realpath(path)  # Links para o mesmo arquivo são agrupados
+        with self.lock:
+            if path in self.active:
+                request = SaveRequest()
+                _, _, waiting = self.pending.get(path, (None, None, []))
+                for older in waiting:
+                    older.superseded = True
+                self.pending[path] = (write, binary, waiting + [request])
+            else:
+                request = None
+                self.active.add(path)
+
+        if request is not None:
+            request.done.wait()
+            if request.error is not None:
+                raise request.error
+            return not request.superseded
+
+        waiting = []
+        try:
+            while True:
+                atomic_write(path, write, self.durability, binary)
+                self.release(waiting)
+                with self.lock:
+                    request = self.pending.pop(path, None)
+                    if request is None:
+                        self.active.discard(path)
+                        return True
+                write, binary, waiting = request
+        except BaseException as e:
+            with self.lock:
+                self.active.discard(path)
+                _, _, queued = self.pending.pop(path, (None, None, []))
+            self.release(waiting + queued, e)
+            raise
+
+    def release(self, waiting, error=None):
+        """Libera os pedidos agrupados depois da gravação que os inclui"""
+        for request in waiting:
+            request.error = error
+            request.done.set()
+
+# Instância compartilhada pelos editores
+saver = Saver()
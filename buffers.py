@@ -0,0 +1,382 @@
+import mmap
+import threading
+from array import array
+from bisect import bisect_left, bisect_right
+
+class ListBuffer:
+    """
+    Buffer de referência: guarda o documento como uma lista simples de strings.
+    """
+    WRITES_BYTES = False  # write_to recebe um arquivo de texto
+    
+    def __init__(self, lines=None):
+        self.lines = list(lines) if lines else [""]
+    
+    def __len__(self):
+        return len(self.lines)
+    
+    def __getitem__(self, line_num):
+        return self.lines[line_num]
+    
+    def __setitem__(self, line_num, text):
+        self.lines[line_num] = text
+    
+    def __iter__(self):
+        return iter(self.lines)
+    
+    def snapshot(self):
+        """Retorna uma cópia independente do documento"""
+        return ListBuffer(self.lines)
+    
+    def has_line(self, line_num):
+        """Indica se a linha existe no documento"""
+        return 0 <= line_num < len(self.lines)
+    
+    def line_at_fraction(self, fraction):
+        """Retorna a linha que fica na fração (0 a 1) do documento"""
+        return int(fraction * (len(self.lines) - 1))
+    
+    def known_lines(self):
+        """Número de linhas já conhecidas (todas, em memória)"""
+        return len(self.lines)
+    
+    def indexing_progress(self):
+        """Fração do documento já indexada (sempre completa em memória)"""
+        return 1.0
+    
+    def append(self, text):
+        """Adiciona uma linha ao final do documento"""
+        self.lines.append(text)
+    
+    def splice(self, start, end, new_lines):
+        """Substitui as linhas de start até end (exclusive) por new_lines"""
+        if not 0 <= start <= end <= len(self.lines):
+            raise IndexError("faixa fora do documento")
+        self.lines[start:end] = new_lines
+    
+    def overwrite(self, line_num, col, char):
+        """Sobrescreve um caractere, completando a linha com espaços se preciso"""
+        self[line_num] = overwrite_char(self[line_num], col, char)
+    
+    def write_to(self, f):
+        """Escreve o documento no arquivo aberto"""
+        f.write('\n'.join(self.lines))
+
+class ChunkedBuffer:
+    """
+    Buffer em blocos de linhas (rope simplificada).
+    As linhas ficam em blocos de até CHUNK_SIZE linhas e o início de cada bloco
+    é indexado, então localizar, sobrescrever e adicionar linhas custa O(log n)
+    mesmo em documentos com centenas de milhares de linhas.
+    Instantâneos compartilham os blocos (cópia na escrita): um bloco só é
+    copiado quando for alterado depois do instantâneo.
+    """
+    CHUNK_SIZE = 1024
+    WRITES_BYTES = False  # write_to recebe um arquivo de texto
+    
+    def __init__(self, lines=None):
+        self.chunks = []
+        self.starts = []  # Número da primeira linha de cada bloco
+        self.length = 0
+        self.shared = set()  # Blocos compartilhados com um instantâneo
+        for text in lines or [""]:
+            self.append(text)
+    
+    def __len__(self):
+        return self.length
+    
+    def locate(self, line_num):
+        """Retorna o índice do bloco e a posição dentro dele para uma linha"""
+        if line_num < 0:
+            line_num += self.length
+        if not 0 <= line_num < self.length:
+            raise IndexError("linha fora do documento")
+        i = bisect_right(self.starts, line_num) - 1
+        return i, line_num - self.starts[i]
+    
+    def writable_chunk(self, i):
+        """Retorna o bloco para alteração, copiando-o se for compartilhado"""
+        if i in self.shared:
+            self.chunks[i] = list(self.chunks[i])
+            self.shared.discard(i)
+        return self.chunks[i]
+    
+    def snapshot(self):
+        """Retorna uma cópia do documento que compartilha os blocos atuais;
+        custa O(número de blocos), não O(número de linhas)"""
+        copy = ChunkedBuffer.__new__(ChunkedBuffer)
+        copy.chunks = list(self.chunks)
+        copy.starts = list(self.starts)
+        copy.length = self.length
+        self.shared = set(range(len(self.chunks)))
+        copy.shared = set(self.shared)
+        return copy
+    
+    def __getitem__(self, line_num):
+        i, offset = self.locate(line_num)
+        return self.chunks[i][offset]
+    
+    def __setitem__(self, line_num, text):
+        i, offset = self.locate(line_num)
+        self.writable_chunk(i)[offset] = text
+    
+    def __iter__(self):
+        for chunk in self.chunks:
+            yield from chunk
+    
+    def has_line(self, line_num):
+        """Indica se a linha existe no documento"""
+        return 0 <= line_num < self.length
+    
+    def line_at_fraction(self, fraction):
+        """Retorna a linha que fica na fração (0 a 1) do documento"""
+        return int(fraction * (self.length - 1))
+    
+    def known_lines(self):
+        """Número de linhas já conhecidas (todas, em memória)"""
+        return self.length
+    
+    def indexing_progress(self):
+        """Fração do documento já indexada (sempre completa em memória)"""
+        return 1.0
+    
+    def append(self, text):
+        """Adiciona uma linha ao final do documento"""
+        if not self.chunks or len(self.chunks[-1]) >= self.CHUNK_SIZE:
+            self.chunks.append([])
+            self.starts.append(self.length)
+        self.writable_chunk(len(self.chunks) - 1).append(text)
+        self.length += 1
+    
+    def splice(self, start, end, new_lines):
+        """Substitui as linhas de start até end (exclusive) por new_lines.
+        Só os blocos atingidos são refeitos; os seguintes apenas mudam de início."""
+        if not 0 <= start <= end <= self.length:
+            raise IndexError("faixa fora do documento")
+        if self.chunks:
+            first = bisect_right(self.starts, start) - 1
+            last = bisect_right(self.starts, end - 1) - 1 if end > start else first
+            head = self.chunks[first][:start - self.starts[first]]
+            tail = self.chunks[last][end - self.starts[last]:]
+        else:
+            first, last, head, tail = 0, -1, [], []
+        
+        lines = head + list(new_lines) + tail
+        new_chunks = [lines[i:i + self.CHUNK_SIZE] for i in range(0, len(lines), self.CHUNK_SIZE)]
+        self.chunks[first:last + 1] = new_chunks
+        
+        # Blocos novos nunca são compartilhados; os seguintes mudam de índice
+        moved = len(new_chunks) - (last + 1 - first)
+        self.shared = ({i for i in self.shared if i < first} |
+                       {i + moved for i in self.shared if i > last})
+        
+        self.length += len(new_lines) - (end - start)
+        line_num = self.starts[first] if first < len(self.starts) else 0
+        del self.starts[first:]
+        for chunk in self.chunks[first:]:
+            self.starts.append(line_num)
+            line_num += len(chunk)
+    
+    def overwrite(self, line_num, col, char):
+        """Sobrescreve um caractere, completando a linha com espaços se preciso"""
+        i, offset = self.locate(line_num)
+        chunk = self.writable_chunk(i)
+        chunk[offset] = overwrite_char(chunk[offset], col, char)
+    
+    def write_to(self, f):
+        """Escreve o documento no arquivo aberto, bloco por bloco"""
+        for i, chunk in enumerate(self.chunks):
+            if i:
+                f.write('\n')
+            f.write('\n'.join(chunk))
+
+class LineIndex:
+    """
+    Índice dos inícios de linha de um arquivo mapeado em memória.
+    É construído em blocos por uma thread de fundo (start) e, quando preciso,
+    sob demanda até a linha pedida. Os offsets só crescem, então o índice pode
+    ser compartilhado entre um buffer e os seus instantâneos.
+    """
+    INDEX_CHUNK = 1 << 20  # Bytes examinados por passo da indexação
+    
+    def __init__(self, data):
+        self.data = data
+        self.size = len(data)
+        self.offsets = array('Q', [0])  # Início de cada linha já indexada
+        self.scanned = 0  # Bytes do arquivo já indexados
+        self.lock = threading.Lock()
+    
+    def start(self):
+        """Indexa o restante do arquivo numa thread de fundo"""
+        threading.Thread(target=self.index_until, args=(float('inf'),), daemon=True).start()
+    
+    def progress(self):
+        """Fração do arquivo já indexada"""
+        return self.scanned / self.size if self.size else 1.0
+    
+    def index_chunk(self):
+        """Indexa o próximo bloco do arquivo"""
+        with self.lock:
+            if self.scanned >= self.size:
+                return
+            end = min(self.scanned + self.INDEX_CHUNK, self.size)
+            # Busca por bytes: NUL e outros bytes binários não interferem
+            pos = self.data.find(b'\n', self.scanned, end)
+            while pos != -1:
+                self.offsets.append(pos + 1)
+                pos = self.data.find(b'\n', pos + 1, end)
+            self.scanned = end
+    
+    def index_until(self, line_num):
+        """Indexa até conhecer o início da linha ou chegar ao fim do arquivo"""
+        while len(self.offsets) <= line_num and self.scanned < self.size:
+            self.index_chunk()
+    
+    def line_at_offset(self, offset):
+        """Retorna a linha que contém o byte, indexando só até ele"""
+        while self.scanned <= offset and self.scanned < self.size:
+            self.index_chunk()
+        return bisect_right(self.offsets, offset) - 1
+    
+    def line_count(self):
+        """Número de linhas do arquivo (indexa o arquivo inteiro)"""
+        self.index_until(float('inf'))
+        return len(self.offsets)
+    
+    def line_bounds(self, line_num):
+        """Retorna (início, fim) da linha em bytes, sem a quebra de linha"""
+        self.index_until(line_num + 1)
+        if line_num + 1 < len(self.offsets):
+            return self.offsets[line_num], self.offsets[line_num + 1] - 1
+        return self.offsets[line_num], self.size
+
+class MappedBuffer:
+    """
+    Buffer preguiçoso para arquivos enormes.
+    O arquivo é mapeado em memória (mmap) e indexado por um LineIndex. As
+    linhas são decodificadas apenas quando visitadas e as edições ficam numa
+    camada sobreposta até o arquivo ser salvo.
+    """
+    WRITE_BLOCK = 4096  # Linhas copiadas de uma vez ao salvar
+    WRITES_BYTES = True  # write_to recebe um arquivo binário
+    
+    def __init__(self, file_path):
+        with open(file_path, 'rb') as f:
+            self.map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.index = LineIndex(self.map)
+        self.overlay = {}  # {linha: texto editado}
+        self.appended = []  # Linhas criadas após o fim do arquivo
+    
+    def snapshot(self):
+        """Retorna uma cópia do documento; o mapeamento e o índice são
+        compartilhados e só as edições são copiadas"""
+        copy = MappedBuffer.__new__(MappedBuffer)
+        copy.map = self.map
+        copy.index = self.index
+        copy.overlay = dict(self.overlay)
+        copy.appended = list(self.appended)
+        return copy
+    
+    def start_indexing(self):
+        """Indexa o restante do arquivo numa thread de fundo"""
+        self.index.start()
+    
+    def indexing_progress(self):
+        """Fração do arquivo já indexada"""
+        return self.index.progress()
+    
+    def line_at_fraction(self, fraction):
+        """Retorna a linha que fica na fração (0 a 1) do arquivo, em bytes.
+        Nunca indexa: uma posição ainda não indexada dá a última linha
+        conhecida, até a indexação de fundo chegar lá."""
+        offset = int(fraction * self.index.size)
+        if fraction >= 1 or offset >= self.index.scanned:
+            return self.known_lines() - 1
+        return self.index.line_at_offset(offset)
+    
+    def known_lines(self):
+        """Número de linhas já conhecidas, sem indexar mais nada. As linhas
+        acrescentadas só contam depois de o arquivo inteiro ser indexado."""
+        known = len(self.index.offsets)
+        if self.index.scanned >= self.index.size:
+            known += len(self.appended)
+        return known
+    
+    def file_lines(self):
+        """Número de linhas do arquivo mapeado (indexa o arquivo inteiro)"""
+        return self.index.line_count()
+    
+    def __len__(self):
+        return self.file_lines() + len(self.appended)
+    
+    def has_line(self, line_num):
+        """Indica se a linha existe, indexando só o necessário"""
+        if line_num < 0:
+            return False
+        self.index.index_until(line_num)
+        known_lines = len(self.index.offsets)
+        return line_num < known_lines or line_num < known_lines + len(self.appended)
+    
+    def __getitem__(self, line_num):
+        if line_num in self.overlay:
+            return self.overlay[line_num]
+        if not self.has_line(line_num):
+            raise IndexError("linha fora do documento")
+        if line_num < len(self.index.offsets):
+            start, end = self.index.line_bounds(line_num)
+            return self.map[start:end].decode('utf-8', errors='replace')
+        return self.appended[line_num - len(self.index.offsets)]
+    
+    def __setitem__(self, line_num, text):
+        if not self.has_line(line_num):
+            raise IndexError("linha fora do documento")
+        if line_num < len(self.index.offsets):
+            self.overlay[line_num] = text
+        else:
+            self.appended[line_num - len(self.index.offsets)] = text
+    
+    def __iter__(self):
+        for line_num in range(len(self)):
+            yield self[line_num]
+    
+    def append(self, text):
+        """Adiciona uma linha ao final do documento"""
+        self.file_lines()
+        self.appended.append(text)
+    
+    def overwrite(self, line_num, col, char):
+        """Sobrescreve um caractere, completando a linha com espaços se preciso"""
+        self[line_num] = overwrite_char(self[line_num], col, char)
+    
+    def write_to(self, f):
+        """Escreve o documento no arquivo binário aberto. As linhas sem edições
+        são copiadas em bytes direto do arquivo mapeado, sem decodificar:
+        bytes que não são UTF-8 válido chegam intactos ao disco."""
+        file_lines = self.file_lines()
+        offsets = self.index.offsets
+        edited = sorted(self.overlay)
+        for start in range(0, file_lines, self.WRITE_BLOCK):
+            end = min(start + self.WRITE_BLOCK, file_lines)
+            if bisect_left(edited, start) == bisect_left(edited, end):
+                # Bloco intacto: inclui as quebras de linha do próprio arquivo
+                block_end = offsets[end] if end < file_lines else self.index.size
+                f.write(self.map[offsets[start]:block_end])
+            else:
+                for line_num in range(start, end):
+                    if line_num in self.overlay:
+                        f.write(self.overlay[line_num].encode('utf-8'))
+                    else:
+                        line_start, line_end = self.index.line_bounds(line_num)
+                        f.write(self.map[line_start:line_end])
+                    if line_num + 1 < file_lines:
+                        f.write(b'\n')
+        for text in self.appended:
+            f.write(b'\n')
+            f.write(text.encode('utf-8'))
+
+def overwrite_char(line, col, char):
+    """Retorna a linha com o caractere da coluna substituído"""
+    if col < len(line):
+        return line[:col] + char + line[col + 1:]
+    # Adiciona caractere no final da linha
+    return line + ' ' * (col - len(line)) + char
@@ -0,0 +1,176 @@
+from buffers import ChunkedBuffer
+
+# Notificações enviadas aos assinantes do documento: listener(evento, *args)
+STRUCK = 'struck'  # (linha, coluna, caractere) - caractere batido
+LINE_ADDED = 'line_added'  # (linha,) - linha criada no final do documento
+CURSOR_MOVED = 'cursor_moved'  # (linha, coluna) - nova posição do cursor
+
+class Document:
+    """
+    Núcleo do editor, sem interface: guarda o texto num buffer de linhas e
+    aplica as regras comuns aos editores:
+    - Sobrescrita de caracteres (strike)
+    - Limite de width caracteres por linha
+    - Quebra de linha apenas no final do documento ou quando a linha atinge
+      o limite (carriage_return)
+    - Backspace/Delete e setas apenas movem o cursor
+    As interfaces assinam as mudanças com subscribe e atualizam a tela,
+    o diário de edições etc. a partir das notificações.
+    """
+
+    def __init__(self, lines=None, width=80):
+        self.lines = lines if lines is not None else ChunkedBuffer()
+        self.width = width
+        self.line = 0  # Posição do cursor
+        self.col = 0
+        self.listeners = []
+
+    def subscribe(self, listener):
+        """Passa a enviar as notificações do documento para listener"""
+        self.listeners.append(listener)
+
+    def unsubscribe(self, listener):
+        self.listeners.remove(listener)
+
+    def notify(self, event, *args):
+        for listener in self.listeners:
+            listener(event, *args)
+
+    def reset(self, lines):
+        """Troca o conteúdo do documento e volta o cursor ao início"""
+        self.lines = lines
+        self.line = 0
+        self.col = 0
+
+    def line_text(self, line_num=None):
+        """Retorna o texto da linha (a do cursor por padrão)"""
+        if line_num is None:
+            line_num = self.line
+        if self.lines.has_line(line_num):
+            return self.lines[line_num]
+        return ""
+
+    def move_to(self, line_num, col):
+        """Posiciona o cursor"""
+        if (line_num, col) != (self.line, self.col):
+            self.line, self.col = line_num, col
+            self.notify(CURSOR_MOVED, line_num, col)
+
+    def strike(self, char):
+        """Bate um caractere no cursor e avança; retorna False se a linha já
+        atingiu o limite"""
+        if self.col >= self.width:
+            return False
+        self.strike_at(self.line, self.col, char)
+        self.move_to(self.line, self.col + 1)
+        return True
+
+    def strike_at(self, line_num, col, char):
+        """Sobrescreve o caractere da posição, criando a linha se preciso"""
+        if not self.lines.has_line(line_num):
+            first_missing = line_num
+            while first_missing > 0 and not self.lines.has_line(first_missing - 1):
+                first_missing -= 1
+            for new_line in range(first_missing, line_num + 1):
+                self.lines.append("")
+                self.notify(LINE_ADDED, new_line)
+        self.lines.overwrite(line_num, col, char)
+        self.notify(STRUCK, line_num, col, char)
+
+    def carriage_return(self):
+        """Enter: cria uma linha apenas no final do documento ou quando a linha
+        atingiu o limite; caso contrário só move o cursor"""
+        current_line = self.line_text()
+        is_last_line = not self.lines.has_line(self.line + 1)
+
+        if is_last_line and self.col >= len(current_line):
+            # Estamos no final da última linha - cria nova linha
+            self.append_line()
+        elif len(current_line) >= self.width:
+            # Linha atingiu o limite - vai para próxima linha ou cria nova
+            if self.lines.has_line(self.line + 1):
+                self.move_to(self.line + 1, 0)
+            else:
+                self.append_line()
+        elif self.col < len(current_line):
+            # Move cursor para o final da linha atual
+            self.move_to(self.line, len(current_line))
+        elif self.lines.has_line(self.line + 1):
+            # Ou para o início da próxima
+            self.move_to(self.line + 1, 0)
+
+    def append_line(self):
+        """Cria uma linha após a última (a do cursor) e move o cursor para ela"""
+        self.lines.append("")
+        self.notify(LINE_ADDED, self.line + 1)
+        self.move_to(self.line + 1, 0)
+
+    def move_left(self):
+        """Move o cursor para trás sem apagar (Backspace)"""
+        if self.col > 0:
+            self.move_to(self.line, self.col - 1)
+        elif self.line > 0:
+            self.move_to(self.line - 1, len(self.line_text(self.line - 1)))
+
+    def move_right(self):
+        """Move o cursor para frente sem apagar (Delete)"""
+        if self.col < len(self.line_text()):
+            self.move_to(self.line, self.col + 1)
+        elif self.lines.has_line(self.line + 1):
+            self.move_to(self.line + 1, 0)
+
+    def move_up(self):
+        if self.line > 0:
+            self.move_to(self.line - 1, min(self.col, len(self.line_text(self.line - 1))))
+
+    def move_down(self):
+        if self.lines.has_line(self.line + 1):
+            self.move_to(self.line + 1, min(self.col, len(self.line_text(self.line + 1))))
+
+    def goto_line(self, line_num):
+        """Move o cursor para o início da linha, limitada às linhas já
+        conhecidas: o salto nunca espera a indexação do documento inteiro"""
+        line_num = min(max(0, line_num), self.lines.known_lines() - 1)
+        self.move_to(line_num, 0)
+
+class TypewriterDocument(Document):
+    """
+    Documento com as regras da máquina de escrever: cada batida se sobrepõe
+    ao que já está na posição, o Enter sempre avança o carro para a próxima
+    linha e o cursor anda livremente pela folha.
+    O armazenamento só precisa de add(linha, coluna, caractere).
+    """
+
+    def strike_at(self, line_num, col, char):
+        """Sobrepõe o caractere ao que já foi batido na posição"""
+        self.lines.add(line_num, col, char)
+        self.notify(STRUCK, line_num, col, char)
+
+    def carriage_return(self):
+        """Retorno do carro: início da próxima linha"""
+        self.move_to(self.line + 1, 0)
+
+    def move_left(self):
+        if self.col > 0:
+            self.move_to(self.line, self.col - 1)
+        elif self.line > 0:
+            self.move_to(self.line - 1, self.width - 1)
+
+    def move_right(self):
+        if self.col < self.width - 1:
+            self.move_to(self.line, self.col + 1)
+        else:
+            self.move_to(self.line + 1, 0)
+
+    def move_up(self):
+        if self.line > 0:
+            self.move_to(self.line - 1, self.col)
+
+    def move_down(self):
+        self.move_to(self.line + 1, self.col)
+
+    def tab(self):
+        """Avança para a próxima tabulação (múltiplo de 8) dentro da linha"""
+        next_tab = ((self.col // 8) + 1) * 8
+        if next_tab < self.width:
+            self.move_to(self.line, next_tab)
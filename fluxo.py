@@ -1,9 +1,86 @@
 import tkinter as tk
 from tkinter import filedialog, messagebox
 import os
+import codecs
+import io
+import hashlib
+from concurrent.futures import ThreadPoolExecutor, wait
 from datetime import datetime
 import sys
 
+from atomic_save import saver
+from buffers import ChunkedBuffer
+from document import Document, STRUCK, LINE_ADDED, CURSOR_MOVED
+
+class DigestWriter:
+    """
+    Arquivo de escrita que calcula o resumo do que recebe e, opcionalmente,
+    repassa o texto a outro arquivo.
+    """
+    def __init__(self, target=None):
+        self.hash = hashlib.blake2b(digest_size=16)
+        self.target = target
+
+    def write(self, text):
+        self.hash.update(text.encode('utf-8'))
+        if self.target is not None:
+            self.target.write(text)
+
+    def digest(self):
+        return self.hash.digest()
+
+def write_document(path, lines):
+    """Grava o documento de forma atómica e devolve o resumo do conteúdo,
+    ou None se um pedido mais recente o substituiu no disco.
+    Corre na thread de gravação, a partir de um instantâneo do documento."""
+    writers = []
+
+    def write(f):
+        writers.append(DigestWriter(f))
+        lines.write_to(writers[-1])
+
+    if not saver.save(path, write):
+        return None
+    return writers[-1].digest()
+
+class ChunkedLineReader:
+    """
+    Lê um ficheiro UTF-8 em blocos de tamanho fixo e devolve as linhas
+    completas de cada bloco. Também calcula o resumo do conteúdo lido
+    (já com as quebras de linha convertidas).
+    """
+    def __init__(self, path, chunk_size):
+        self.file = open(path, 'rb')
+        self.size = os.fstat(self.file.fileno()).st_size
+        self.chunk_size = chunk_size
+        # Converte \r\n e \r em \n, como o modo texto de open()
+        self.decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder('utf-8')(), translate=True)
+        self.digest = DigestWriter()
+        self.partial = ""  # Início da última linha, ainda incompleta
+        self.done = False
+
+    def read_lines(self):
+        """Lê o próximo bloco e devolve as linhas que ficaram completas."""
+        data = self.file.read(self.chunk_size)
+        text = self.decoder.decode(data, final=not data)
+        self.digest.write(text)
+        lines = (self.partial + text).split('\n')
+        if data:
+            self.partial = lines.pop()
+        else:
+            self.done = True
+            self.close()
+        return lines
+
+    def progress(self):
+        """Fração do ficheiro já lida."""
+        if self.done or not self.size:
+            return 1.0
+        return self.file.tell() / self.size
+
+    def close(self):
+        self.file.close()
+
 class TextEditor:
     """
     Uma aplicação de editor de texto simples com uma interface gráfica
@@ -15,12 +92,42 @@ class TextEditor:
     **Quebra de linha permitida APENAS após a última linha do documento ou
     quando a linha atual atinge 80 caracteres.**
     **O texto é visualmente centralizado na janela com um tema escuro.**
+
+    O documento fica num ChunkedBuffer; o widget Text mostra apenas uma janela
+    de WINDOW_LINES linhas em torno da vista, que é deslocada quando o cursor
+    ou a vista se aproximam da borda. Abrir e guardar não dependem do número
+    de linhas do widget.
     """
+    MAX_LINE_LENGTH = 80
+    WINDOW_LINES = 400  # Linhas do documento carregadas no widget
+    WINDOW_MARGIN = 100  # Distância da borda da janela que provoca o deslocamento
+    LOAD_CHUNK_SIZE = 256 * 1024  # Bytes lidos por etapa da abertura progressiva
+    SAVE_POLL_INTERVAL = 50  # Milissegundos entre verificações das gravações
+
     def __init__(self, root, initial_file_path=None):
         """Inicializa o editor de texto."""
         self.root = root
         self.file_path = None
         self.auto_save_id = None
+        # Rastreamento de alterações sem leitura do disco
+        self.edit_generation = 0  # Incrementado a cada <<Modified>> do widget
+        self.saved_generation = 0
+        self.saved_digest = self.content_digest("")
+        # Documento e janela carregada no widget
+        self.document = Document(ChunkedBuffer(), width=self.MAX_LINE_LENGTH)
+        self.document.subscribe(self.on_document_change)
+        self.window_start = 0  # Linha do documento na linha 1 do widget
+        self.window_size = 1  # Linhas do documento cobertas pela janela
+        self.window_generation = 0  # Geração já copiada da janela para o documento
+        self.window_check_id = None
+        # Abertura progressiva em curso
+        self.loader = None
+        self.load_id = None
+        self.save_after_load = False
+        # Gravações em segundo plano: (futuro, documento, geração)
+        self.save_executor = ThreadPoolExecutor(max_workers=1)
+        self.pending_saves = []
+        self.save_poll_id = None
         self.setup_ui()
 
         if initial_file_path:
@@ -32,6 +139,10 @@ class TextEditor:
             self.save_file()
             self.root.title(f"Editor de Texto - {new_filename}")
 
+    @property
+    def lines(self):
+        return self.document.lines
+
     def setup_ui(self):
         """Configura a interface gráfica do utilizador."""
         self.root.geometry("800x600")
@@ -57,7 +168,8 @@ class TextEditor:
             pady=10,
             background="#2d2d2d",
             insertbackground="white",
-            foreground="#A0A0A0"
+            foreground="#A0A0A0",
+            yscrollcommand=self.on_view_changed
         )
         self.text_area.pack(expand=True, fill='both')
 
@@ -65,7 +177,12 @@ class TextEditor:
         self.text_area.tag_configure('current_line', background="#404040", foreground="white")
         self.text_area.tag_configure('limit_exceeded', background="#663333", foreground="white")
 
+        # Marca o início da linha destacada; acompanha inserções e remoções de texto
+        self.text_area.mark_set('highlighted_line', '1.0')
+        self.text_area.mark_gravity('highlighted_line', tk.LEFT)
+
         # --- Bindings de Eventos e Atalhos ---
+        self.text_area.bind('<<Modified>>', self.on_modified)
         self.text_area.bind('<KeyRelease>', self.update_status)
         self.text_area.bind('<ButtonRelease>', self.update_status)
         self.root.protocol("WM_DELETE_WINDOW", self.exit_editor)
@@ -99,68 +216,170 @@ class TextEditor:
 
     def handle_enter_key(self, event=None):
         """
-        Manipula a tecla Enter para permitir quebras de linha apenas:
-        1. No final do documento.
-        2. Quando a linha atual já atingiu 80 caracteres.
-        Caso contrário, move o cursor para o final da linha atual ou início da próxima.
+        Manipula a tecla Enter com as regras do documento: quebra de linha
+        apenas no final do documento ou quando a linha atual já atingiu o
+        limite; caso contrário move o cursor para o final da linha atual ou
+        início da próxima.
         """
-        MAX_LINE_LENGTH = 80
-
-        current_index = self.text_area.index(tk.INSERT)
-        line_num, col_num = map(int, current_index.split('.'))
-
-        line_start_index = f"{line_num}.0"
-        line_end_index_incl_newline = f"{line_num}.end"
-        line_content = self.text_area.get(line_start_index, line_end_index_incl_newline).replace('\n', '')
-        current_line_length = len(line_content)
-
-        # Verifica se estamos na última linha do documento
-        last_line_index = self.text_area.index(tk.END + "-1c linestart").split('.')[0]
-        is_last_line = (line_num == int(last_line_index))
-
-        # Se a linha atual atingiu 80 caracteres
-        if current_line_length >= MAX_LINE_LENGTH:
-            next_line_start = f"{line_num + 1}.0"
-            next_line_end = f"{line_num + 1}.end"
-            
-            # Verifica se a próxima linha existe e tem conteúdo
-            if self.text_area.compare(next_line_start, "<", tk.END):
-                next_line_content = self.text_area.get(next_line_start, next_line_end).replace('\n', '')
-                if next_line_content:  # Se há conteúdo na próxima linha
-                    # Vai para o início da próxima linha
-                    self.text_area.mark_set(tk.INSERT, next_line_start)
-                else:  # Se a próxima linha está vazia
-                    # Cria uma nova linha
-                    self.text_area.edit_separator()
-                    self.text_area.insert(tk.INSERT, '\n')
-            else:  # Se não há próxima linha
-                # Cria uma nova linha
-                self.text_area.edit_separator()
-                self.text_area.insert(tk.INSERT, '\n')
-            
-            self.update_status()
-            return "break"
-
-        # Se estamos na última linha e no final dela
-        if is_last_line and col_num == current_line_length:
-            self.text_area.edit_separator()
-            self.text_area.insert(tk.INSERT, '\n')
-            self.update_status()
+        self.ensure_window()
+        line_num = int(self.text_area.index(tk.INSERT).split('.')[0])
+        if self.loader is not None and not self.lines.has_line(self.window_start + line_num):
+            # O fim do documento ainda não foi lido: uma linha criada aqui
+            # ficaria no meio do ficheiro
             return "break"
 
-        # Caso contrário, move o cursor
-        if col_num < current_line_length:
-            self.text_area.mark_set(tk.INSERT, line_end_index_incl_newline)
-        else:
-            next_line_start = f"{line_num + 1}.0"
-            if self.text_area.compare(next_line_start, "<", tk.END):
-                self.text_area.mark_set(tk.INSERT, next_line_start)
-            else:
-                self.text_area.mark_set(tk.INSERT, line_end_index_incl_newline)
-
+        self.text_area.edit_separator()
+        self.document_edit(self.document.carriage_return)
         self.update_status()
         return "break"
 
+    def on_modified(self, event=None):
+        """Conta as edições do widget e rearma a flag de modificação do Tk."""
+        if self.text_area.edit_modified():
+            self.edit_generation += 1
+            self.text_area.edit_modified(False)
+
+    def content_digest(self, content):
+        """Calcula o resumo do conteúdo usado para comparar com o estado salvo."""
+        return hashlib.blake2b(content.encode('utf-8'), digest_size=16).digest()
+
+    def document_digest(self):
+        """Calcula o resumo do documento inteiro sem montar uma única string."""
+        self.flush_window()
+        writer = DigestWriter()
+        self.lines.write_to(writer)
+        return writer.digest()
+
+    def mark_saved(self, digest):
+        """Regista o resumo do conteúdo atual como o estado guardado."""
+        self.saved_digest = digest
+        self.saved_generation = self.edit_generation
+
+    def window_reaches_end(self):
+        """Indica se a janela carregada vai até ao fim do documento.
+        Enquanto o ficheiro é aberto o fim ainda não é conhecido."""
+        if self.loader is not None:
+            return False
+        return self.window_start + self.window_size >= len(self.lines)
+
+    def window_bounds(self, first_line):
+        """Devolve a faixa de linhas do documento de uma janela que começa
+        perto de first_line."""
+        first_line = max(0, min(first_line, len(self.lines) - self.WINDOW_LINES))
+        return first_line, min(first_line + self.WINDOW_LINES, len(self.lines))
+
+    def load_window(self, first_line):
+        """Carrega no widget as linhas do documento a partir de first_line.
+        Não copia a janela anterior; use flush_window antes se preciso."""
+        first_line, last_line = self.window_bounds(first_line)
+        text = '\n'.join([self.lines[i] for i in range(first_line, last_line)])
+
+        self.text_area.delete('1.0', tk.END)
+        self.text_area.insert('1.0', text)
+        # Carregar a janela não é uma edição: limpa a flag e o histórico de
+        # desfazer, cujos índices só valem para a janela anterior
+        self.text_area.edit_modified(False)
+        self.text_area.edit_reset()
+        self.window_start = first_line
+        self.window_size = last_line - first_line
+        self.window_generation = self.edit_generation
+
+    def flush_window(self):
+        """Copia as edições feitas no widget para o documento."""
+        self.on_modified()
+        if self.window_generation == self.edit_generation:
+            return
+        window_lines = self.text_area.get('1.0', 'end-1c').split('\n')
+        self.lines.splice(self.window_start, self.window_start + self.window_size, window_lines)
+        self.window_size = len(window_lines)
+        self.window_generation = self.edit_generation
+
+    def shift_window(self, first_line):
+        """Carrega outra faixa do documento mantendo o cursor e a vista."""
+        cursor_line, cursor_col = map(int, self.text_area.index(tk.INSERT).split('.'))
+        top_line = int(self.text_area.index('@0,0').split('.')[0])
+        self.flush_window()
+        cursor_doc_line = self.window_start + cursor_line - 1
+        top_doc_line = self.window_start + top_line - 1
+
+        self.load_window(first_line)
+        if not self.window_start <= cursor_doc_line < self.window_start + self.window_size:
+            # A vista foi rolada para longe do cursor: leva-o para o topo da vista
+            cursor_doc_line, cursor_col = top_doc_line, 0
+        self.text_area.mark_set(tk.INSERT, f"{cursor_doc_line - self.window_start + 1}.{cursor_col}")
+        self.text_area.yview(f"{top_doc_line - self.window_start + 1}.0")
+
+    def ensure_window(self):
+        """Desloca a janela quando o cursor ou a vista chegam perto de uma
+        borda que não é o início ou o fim do documento."""
+        cursor_line = int(self.text_area.index(tk.INSERT).split('.')[0]) - 1
+        first_visible = int(self.text_area.index('@0,0').split('.')[0]) - 1
+        last_visible = int(self.text_area.index(f'@0,{self.text_area.winfo_height()}').split('.')[0]) - 1
+        widget_lines = int(self.text_area.index('end-1c').split('.')[0])
+
+        near_top = self.window_start > 0 and \
+            min(cursor_line, first_visible) < self.WINDOW_MARGIN
+        near_bottom = not self.window_reaches_end() and \
+            max(cursor_line, last_visible) >= widget_lines - self.WINDOW_MARGIN
+        if near_top or near_bottom:
+            visible = last_visible - first_visible + 1
+            first_line = self.window_start + first_visible - (self.WINDOW_LINES - visible) // 2
+            # Perto do fim do que já foi lido a janela pode não ter para onde ir
+            if self.window_bounds(first_line) != (self.window_start, self.window_start + self.window_size):
+                self.shift_window(first_line)
+
+    def on_view_changed(self, first, last):
+        """Acompanha a rolagem da vista (inclusive pela roda do rato)."""
+        if self.window_check_id is None:
+            self.window_check_id = self.root.after_idle(self.check_window)
+
+    def check_window(self):
+        """Verifica a posição da janela depois de a vista ser rolada."""
+        self.window_check_id = None
+        self.ensure_window()
+
+    def document_edit(self, operation, *args):
+        """Aplica uma operação do documento na posição do cursor do widget.
+        As notificações do documento refletem a operação na janela."""
+        self.flush_window()
+        line_num, col_num = map(int, self.text_area.index(tk.INSERT).split('.'))
+        # Sem notificação: o widget já está nesta posição
+        self.document.line = self.window_start + line_num - 1
+        self.document.col = col_num
+
+        result = operation(*args)
+        # A janela já recebeu a operação; não precisa ser copiada de volta
+        self.on_modified()
+        self.window_generation = self.edit_generation
+        if not self.window_start <= self.document.line < self.window_start + self.window_size:
+            # O cursor saiu da janela: carrega a faixa em volta dele
+            self.load_window(self.document.line - self.WINDOW_LINES // 2)
+            self.text_area.mark_set(tk.INSERT, f"{self.document.line - self.window_start + 1}.{self.document.col}")
+        return result
+
+    def on_document_change(self, event, line_num, *args):
+        """Reflete no widget as mudanças do documento que caem na janela."""
+        if event == LINE_ADDED:
+            if line_num == self.window_start + self.window_size:
+                self.text_area.insert('end-1c', '\n')
+                self.window_size += 1
+            return
+
+        if not self.window_start <= line_num < self.window_start + self.window_size:
+            return
+        line_index = line_num - self.window_start + 1
+        if event == STRUCK:
+            col_num, char = args
+            line_length = int(self.text_area.index(f"{line_index}.end").split('.')[1])
+            if col_num < line_length:
+                self.text_area.delete(f"{line_index}.{col_num}")
+                self.text_area.insert(f"{line_index}.{col_num}", char)
+            else:
+                self.text_area.insert(f"{line_index}.end", ' ' * (col_num - line_length) + char)
+        elif event == CURSOR_MOVED:
+            col_num, = args
+            self.text_area.mark_set(tk.INSERT, f"{line_index}.{col_num}")
+
     def start_auto_save(self):
         """Inicia o agendamento do salvamento automático."""
         self.auto_save_id = self.root.after(5000, self.auto_save_file)
@@ -170,58 +389,45 @@ class TextEditor:
         Verifica se há alterações e salva o arquivo automaticamente.
         Em seguida, reagenda-se.
         """
-        if self.has_changes() and self.file_path:
+        # Só compara gerações: o resumo do documento custaria mais na thread
+        # do Tk do que a gravação em segundo plano
+        self.on_modified()
+        if self.loader is None and not self.pending_saves and self.file_path and \
+           self.edit_generation != self.saved_generation:
             self.save_file()
 
         self.auto_save_id = self.root.after(5000, self.auto_save_file)
 
     def handle_backspace(self, event=None):
         """Move o cursor para trás sem apagar o caractere."""
-        current_index = self.text_area.index(tk.INSERT)
-        if current_index != "1.0":
-            self.text_area.mark_set(tk.INSERT, f"{current_index}-1c")
+        self.document_edit(self.document.move_left)
         self.update_status()
         return "break"
 
     def handle_delete(self, event=None):
         """Move o cursor para frente sem apagar o caractere."""
-        current_index = self.text_area.index(tk.INSERT)
-        if current_index != self.text_area.index(tk.END + "-1c"):
-            self.text_area.mark_set(tk.INSERT, f"{current_index}+1c")
+        self.document_edit(self.document.move_right)
         self.update_status()
         return "break"
 
     def handle_key_press_for_overwrite(self, event=None):
         """
         Manipula o pressionamento de tecla para implementar a sobrescrita
-        e impor o limite de 80 caracteres por linha.
+        e impor o limite de caracteres por linha.
         """
-        MAX_LINE_LENGTH = 80
-
-        self.text_area.tag_remove('limit_exceeded', '1.0', 'end')
+        self.text_area.tag_remove('limit_exceeded', 'highlighted_line', 'highlighted_line lineend')
 
         if event.state & 0x4:
             if event.keysym in ['z', 'y']:
                 return None
 
-        if not (event.state & 0x4) and event.char and len(event.char) == 1 and \
+        if not (event.state & 0x4) and event.char and len(event.char) == 1 and event.char.isprintable() and \
            event.keysym not in ['BackSpace', 'Delete', 'Left', 'Right', 'Up', 'Down', 'Return']:
 
-            current_index = self.text_area.index(tk.INSERT)
-            line_start_index = f"{current_index.split('.')[0]}.0"
-            line_content = self.text_area.get(line_start_index, current_index)
-
-            current_line_length = len(line_content)
-
-            if current_line_length >= MAX_LINE_LENGTH:
-                self.text_area.tag_add('limit_exceeded', line_start_index, f"{current_index.split('.')[0]}.end")
-                return "break"
-
-            char_at_cursor = self.text_area.get(current_index, f"{current_index}+1c")
-            if char_at_cursor and char_at_cursor != '\n' and current_index != self.text_area.index(tk.END + "-1c"):
-                self.text_area.delete(current_index)
-
-            return None
+            if not self.document_edit(self.document.strike, event.char):
+                line_num = self.text_area.index(tk.INSERT).split('.')[0]
+                self.text_area.tag_add('limit_exceeded', f"{line_num}.0", f"{line_num}.end")
+            return "break"
 
         return None
 
@@ -231,8 +437,11 @@ class TextEditor:
             if not messagebox.askyesno("Guardar Alterações?", "O ficheiro atual tem alterações não guardadas. Quer continuar?"):
                 return
 
-        self.text_area.delete(1.0, tk.END)
+        self.cancel_loading()
+        self.document.reset(ChunkedBuffer())
+        self.load_window(0)
         self.file_path = None
+        self.mark_saved(self.content_digest(""))
         self.update_status()
 
     def open_file(self, event=None, file_path=None):
@@ -246,35 +455,134 @@ class TextEditor:
         else:
             path = file_path
 
+        reader = None
         try:
-            with open(path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            self.text_area.delete(1.0, tk.END)
-            self.text_area.insert(tk.END, content)
-            self.file_path = path
-            self.root.title(f"Editor de Texto - {os.path.basename(path)}")
-            self.update_status()
+            reader = ChunkedLineReader(path, self.LOAD_CHUNK_SIZE)
+            # Lê só o necessário para a primeira janela; o restante é lido em
+            # etapas agendadas e o utilizador já pode editar o que foi mostrado
+            first_lines = []
+            while len(first_lines) < self.WINDOW_LINES and not reader.done:
+                first_lines.extend(reader.read_lines())
         except FileNotFoundError:
             messagebox.showerror("Erro ao Abrir", f"O ficheiro não foi encontrado:\n{path}")
             self.file_path = None
             self.new_file()
+            return
         except Exception as e:
+            if reader is not None:
+                reader.close()
             messagebox.showerror("Erro ao Abrir", f"Não foi possível abrir o ficheiro:\n{e}")
+            return
+
+        self.cancel_loading()
+        self.loader = reader
+        self.document.reset(ChunkedBuffer(first_lines))
+        self.load_window(0)
+        self.mark_saved(self.content_digest(""))
+        self.file_path = path
+        self.update_status()
+        if reader.done:
+            self.finish_loading()
+        else:
+            self.update_title()
+            self.load_id = self.root.after(1, self.load_next_chunk)
+
+    def update_title(self):
+        """Mostra o nome do ficheiro e o progresso da abertura."""
+        title = f"Editor de Texto - {os.path.basename(self.file_path)}"
+        if self.loader is not None:
+            title += f" (a carregar {int(self.loader.progress() * 100)}%)"
+        self.root.title(title)
+
+    def load_next_chunk(self):
+        """Acrescenta ao documento o próximo bloco do ficheiro em abertura."""
+        self.load_id = None
+        try:
+            lines = self.loader.read_lines()
+        except Exception as e:
+            # Documento incompleto: não pode substituir o ficheiro
+            self.cancel_loading()
+            self.file_path = None
+            self.root.title("Editor de Texto")
+            messagebox.showerror("Erro ao Abrir", f"Não foi possível abrir o ficheiro:\n{e}")
+            return
+
+        end = len(self.lines)
+        self.lines.splice(end, end, lines)
+        if self.loader.done:
+            self.finish_loading()
+        else:
+            self.update_title()
+            self.load_id = self.root.after(1, self.load_next_chunk)
+
+    def finish_loading(self):
+        """Conclui a abertura: o conteúdo lido passa a ser o estado guardado."""
+        self.saved_digest = self.loader.digest.digest()
+        self.loader = None
+        self.update_title()
+        self.ensure_window()
+        if self.save_after_load:
+            self.save_after_load = False
+            self.save_file()
+
+    def cancel_loading(self):
+        """Interrompe uma abertura progressiva em curso."""
+        if self.load_id:
+            self.root.after_cancel(self.load_id)
+            self.load_id = None
+        if self.loader is not None:
+            self.loader.close()
+            self.loader = None
+        self.save_after_load = False
 
     def save_file(self, event=None):
         """Guarda o ficheiro atual. Se for novo, pede um caminho."""
+        if self.loader is not None:
+            # O documento ainda está incompleto: guarda quando a abertura terminar
+            self.save_after_load = True
+            return "break"
         if self.file_path:
-            try:
-                content = self.text_area.get(1.0, "end-1c")
-                with open(self.file_path, 'w', encoding='utf-8') as f:
-                    f.write(content)
-                self.root.title(f"Editor de Texto - {os.path.basename(self.file_path)}")
-            except Exception as e:
-                messagebox.showerror("Erro ao Guardar", f"Não foi possível guardar o ficheiro:\n{e}")
+            # O instantâneo é tirado na thread do Tk (cópia na escrita, barato);
+            # a codificação e a escrita no disco ficam com a thread de gravação
+            self.flush_window()
+            future = self.save_executor.submit(write_document, self.file_path, self.lines.snapshot())
+            self.pending_saves.append((future, self.lines, self.edit_generation))
+            if self.save_poll_id is None:
+                self.save_poll_id = self.root.after(self.SAVE_POLL_INTERVAL, self.check_saves)
         else:
             self.save_as_file()
         return "break"
 
+    def check_saves(self):
+        """Trata as gravações concluídas, pela ordem em que foram pedidas."""
+        self.save_poll_id = None
+        while self.pending_saves and self.pending_saves[0][0].done():
+            self.finish_save(*self.pending_saves.pop(0))
+        if self.pending_saves:
+            self.save_poll_id = self.root.after(self.SAVE_POLL_INTERVAL, self.check_saves)
+
+    def finish_save(self, future, document, generation):
+        """Regista o resultado de uma gravação em segundo plano."""
+        try:
+            digest = future.result()
+        except Exception as e:
+            messagebox.showerror("Erro ao Guardar", f"Não foi possível guardar o ficheiro:\n{e}")
+            return
+        if document is not self.lines or digest is None:
+            return  # Outro documento foi aberto entretanto, ou outro conteúdo foi gravado
+        # Só as edições anteriores ao instantâneo ficam marcadas como guardadas
+        self.saved_digest = digest
+        self.saved_generation = max(self.saved_generation, generation)
+        self.update_title()
+
+    def wait_for_saves(self):
+        """Espera pelas gravações em curso (ao sair)."""
+        if self.save_poll_id:
+            self.root.after_cancel(self.save_poll_id)
+            self.save_poll_id = None
+        wait([future for future, _, _ in self.pending_saves])
+        self.check_saves()
+
     def save_as_file(self):
         """Guarda o ficheiro atual num novo local."""
         path = filedialog.asksaveasfilename(
@@ -288,42 +596,59 @@ class TextEditor:
         self.save_file()
 
     def has_changes(self):
-        """Verifica se existem alterações não guardadas."""
-        if not self.file_path:
-            return len(self.text_area.get(1.0, "end-1c")) > 0
+        """
+        Verifica se existem alterações não guardadas.
+        Sem edições desde o último salvamento não há nada a calcular; caso
+        contrário compara o resumo do conteúdo com o do estado guardado.
+        """
+        self.on_modified()
+        if self.edit_generation == self.saved_generation:
+            return False
 
-        try:
-            with open(self.file_path, 'r', encoding='utf-8') as f:
-                return self.text_area.get(1.0, "end-1c") != f.read()
-        except FileNotFoundError:
-            return True
-        except Exception:
-            return True
+        if self.document_digest() == self.saved_digest:
+            # As edições foram desfeitas; o conteúdo voltou ao estado guardado
+            self.saved_generation = self.edit_generation
+            return False
+        return True
 
     def update_status(self, event=None):
-        """Atualiza o destaque da linha atual e centraliza-a.
-           Também gerencia o destaque de limite de linha."""
-
-        self.text_area.tag_remove('current_line', '1.0', 'end')
+        """Atualiza o destaque da linha atual e mantém-na visível.
+           Também gerencia o destaque de limite de linha.
+           Só a linha destacada anteriormente e a atual são retocadas."""
 
+        self.ensure_window()
         current_line_index_str = self.text_area.index(tk.INSERT).split('.')[0]
         line_start_index = f"{current_line_index_str}.0"
         line_end_index = f"{current_line_index_str}.end"
-        self.text_area.tag_add('current_line', line_start_index, line_end_index)
 
-        self.text_area.tag_remove('limit_exceeded', '1.0', 'end')
+        for tag in ('current_line', 'limit_exceeded'):
+            self.text_area.tag_remove(tag, 'highlighted_line', 'highlighted_line lineend')
+            self.text_area.tag_remove(tag, line_start_index, line_end_index)
+
+        self.text_area.tag_add('current_line', line_start_index, line_end_index)
+        self.text_area.mark_set('highlighted_line', line_start_index)
 
         current_line_content = self.text_area.get(line_start_index, line_end_index).replace('\n', '')
-        if len(current_line_content) >= 80:
+        if len(current_line_content) >= self.MAX_LINE_LENGTH:
              self.text_area.tag_add('limit_exceeded', line_start_index, line_end_index)
 
-        self.text_area.yview_pickplace(tk.INSERT)
+        self.scroll_to_cursor()
+
+    def scroll_to_cursor(self):
+        """Rola a vista apenas quando o cursor saiu da área visível."""
+        current_line = int(self.text_area.index(tk.INSERT).split('.')[0])
+        first_visible = int(self.text_area.index('@0,0').split('.')[0])
+        last_visible = int(self.text_area.index(f'@0,{self.text_area.winfo_height()}').split('.')[0])
+
+        if not first_visible <= current_line < last_visible:
+            self.text_area.yview_pickplace(tk.INSERT)
 
     def exit_editor(self, event=None):
         """Sai da aplicação, verificando se há alterações não guardadas."""
         if self.auto_save_id:
             self.root.after_cancel(self.auto_save_id)
 
+        self.wait_for_saves()
         if self.has_changes():
             if messagebox.askyesno("Sair", "Tem alterações não guardadas. Quer sair mesmo assim?"):
                 self.root.destroy()
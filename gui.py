@@ -1,13 +1,374 @@
 import pygame
 import sys
-from PIL import Image, ImageDraw, ImageFont
-import string
+import numpy as np
+from PIL import Image
 from datetime import datetime
 import json
 import os
+import zlib
+import struct
+from array import array
+from itertools import groupby
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
 from tkinter import filedialog, messagebox
 import tkinter as tk
 
+from atomic_save import saver
+from document import TypewriterDocument, STRUCK
+
+# Formato binário do estado (.typewriter):
+# cabeçalho STATE_HEADER seguido do corpo (comprimido com zlib se STATE_FLAG_ZLIB)
+STATE_MAGIC = b'TYPW'
+STATE_VERSION = 2  # Versão 1: tamanho dos extras em 16 bits (OVERSTRIKE_V1)
+STATE_FLAG_ZLIB = 0x01
+STATE_HEADER = struct.Struct('<4sBBIIH')  # magia, versão, flags, linha, coluna, largura
+LINE_HEADER = struct.Struct('<IH')  # linha, número de trechos (ou fim da lista)
+RUN = struct.Struct('<IH')  # código, repetições
+OVERSTRIKE = struct.Struct('<IHI')  # linha, coluna, bytes UTF-8 dos extras
+OVERSTRIKE_V1 = struct.Struct('<IHH')
+END_OF_LINES = 0xFFFFFFFF
+STATE_CHUNK = 64 * 1024  # Bytes lidos de uma vez do corpo comprimido
+
+# A compressão do corpo pode ser desligada por instalação
+# (ED_STATE_COMPRESSION=0) ou durante o uso com F2
+DEFAULT_STATE_COMPRESSION = os.environ.get('ED_STATE_COMPRESSION', '1') != '0'
+
+def read_exact(stream, size):
+    """Lê exatamente size bytes do fluxo"""
+    data = stream.read(size)
+    if len(data) != size:
+        raise ValueError("arquivo de estado truncado")
+    return data
+
+class ZlibWriter:
+    """Fluxo de escrita que comprime com zlib o que recebe"""
+    
+    def __init__(self, target, level=6):
+        self.target = target
+        self.compressor = zlib.compressobj(level)
+    
+    def write(self, data):
+        self.target.write(self.compressor.compress(data))
+    
+    def close(self):
+        self.target.write(self.compressor.flush())
+
+class ZlibReader:
+    """Fluxo de leitura que descomprime sob demanda um corpo zlib"""
+    
+    def __init__(self, source):
+        self.source = source
+        # Detecta o cabeçalho: também aceita corpos gravados com gzip
+        self.decompressor = zlib.decompressobj(zlib.MAX_WBITS | 32)
+        self.buffer = b''
+    
+    def read(self, size):
+        while len(self.buffer) < size and not self.decompressor.eof:
+            data = self.source.read(STATE_CHUNK)
+            if not data:
+                break
+            self.buffer += self.decompressor.decompress(data)
+        data, self.buffer = self.buffer[:size], self.buffer[size:]
+        return data
+
+class PageStore:
+    """
+    Página da máquina de escrever em formato compacto.
+    Cada linha é um array de largura fixa com o código do primeiro caractere
+    batido em cada coluna (0 = vazio). Só as posições batidas mais de uma vez
+    guardam os caracteres extras numa tabela de sobreposições.
+    Um índice por linha guarda a última coluna ocupada, para que operações
+    por linha (exportação, altura da imagem) custem O(células).
+    """
+    
+    def __init__(self, width=80):
+        self.width = width
+        self.lines = []  # array('I') por linha, ou None para linhas vazias
+        self.max_cols = []  # Última coluna ocupada de cada linha (-1 = vazia)
+        self.overstrikes = {}  # {(linha, coluna): [caracteres_extras]}
+        self.cell_count = 0
+        self.last_line = -1
+    
+    def __bool__(self):
+        return self.cell_count > 0
+    
+    def __len__(self):
+        return self.cell_count
+    
+    def line(self, line):
+        """Retorna o array de códigos da linha ou None se estiver vazia"""
+        if 0 <= line < len(self.lines):
+            return self.lines[line]
+        return None
+    
+    def get(self, line, col):
+        """Retorna a lista de caracteres batidos na posição"""
+        codes = self.line(line)
+        if codes is None or col >= len(codes) or not codes[col]:
+            return []
+        return [chr(codes[col])] + self.overstrikes.get((line, col), [])
+    
+    def add(self, line, col, char):
+        """Bate um caractere na posição, sobrepondo o que já estiver lá"""
+        if line >= len(self.lines):
+            self.lines.extend([None] * (line + 1 - len(self.lines)))
+            self.max_cols.extend([-1] * (line + 1 - len(self.max_cols)))
+        codes = self.lines[line]
+        if codes is None:
+            codes = self.lines[line] = array('I', bytes(4 * max(self.width, col + 1)))
+        elif col >= len(codes):
+            codes.extend([0] * (col + 1 - len(codes)))
+        
+        if codes[col]:
+            self.overstrikes.setdefault((line, col), []).append(char)
+        else:
+            codes[col] = ord(char)
+            self.cell_count += 1
+            self.max_cols[line] = max(self.max_cols[line], col)
+            self.last_line = max(self.last_line, line)
+    
+    def items(self, first_line=0, last_line=None):
+        """Itera sobre ((linha, coluna), caracteres) em ordem de leitura,
+        opcionalmente só nas linhas de first_line até last_line (exclusivo)"""
+        end = len(self.lines) if last_line is None else min(last_line, len(self.lines))
+        for line in range(first_line, end):
+            codes = self.lines[line]
+            if codes is None:
+                continue
+            for col, code in enumerate(codes):
+                if code:
+                    yield (line, col), [chr(code)] + self.overstrikes.get((line, col), [])
+    
+    def max_line(self):
+        """Retorna o número da última linha com conteúdo (-1 se vazia)"""
+        return self.last_line
+    
+    def max_col(self, line):
+        """Retorna a última coluna ocupada da linha (-1 se vazia)"""
+        if 0 <= line < len(self.max_cols):
+            return self.max_cols[line]
+        return -1
+    
+    def set_line(self, line, codes):
+        """Substitui os códigos de uma linha vazia, atualizando os índices"""
+        if line >= len(self.lines):
+            self.lines.extend([None] * (line + 1 - len(self.lines)))
+            self.max_cols.extend([-1] * (line + 1 - len(self.max_cols)))
+        self.lines[line] = codes
+        occupied = [col for col, code in enumerate(codes) if code]
+        if occupied:
+            self.cell_count += len(occupied)
+            self.max_cols[line] = occupied[-1]
+            self.last_line = max(self.last_line, line)
+    
+    def write_binary(self, stream):
+        """Grava a página no fluxo, linha por linha, com os códigos em trechos
+        repetidos (RLE) seguidos da tabela de sobreposições"""
+        for line, codes in enumerate(self.lines):
+            if codes is None:
+                continue
+            runs = [(code, len(list(group))) for code, group in groupby(codes[:self.max_cols[line] + 1])]
+            stream.write(LINE_HEADER.pack(line, len(runs)))
+            stream.write(b''.join(RUN.pack(code, length) for code, length in runs))
+        stream.write(LINE_HEADER.pack(END_OF_LINES, 0))
+        
+        stream.write(struct.pack('<I', len(self.overstrikes)))
+        for (line, col), chars in self.overstrikes.items():
+            data = ''.join(chars).encode('utf-8')
+            stream.write(OVERSTRIKE.pack(line, col, len(data)))
+            stream.write(data)
+    
+    @classmethod
+    def read_binary(cls, stream, width=80, version=STATE_VERSION):
+        """Lê uma página gravada por write_binary (ou pela versão informada)"""
+        store = cls(width)
+        while True:
+            line, run_count = LINE_HEADER.unpack(read_exact(stream, LINE_HEADER.size))
+            if line == END_OF_LINES:
+                break
+            codes = array('I')
+            for code, length in RUN.iter_unpack(read_exact(stream, RUN.size * run_count)):
+                codes.extend([code] * length)
+            if len(codes) < width:
+                codes.extend([0] * (width - len(codes)))
+            store.set_line(line, codes)
+        
+        overstrike = OVERSTRIKE if version >= 2 else OVERSTRIKE_V1
+        overstrike_count, = struct.unpack('<I', read_exact(stream, 4))
+        for _ in range(overstrike_count):
+            line, col, size = overstrike.unpack(read_exact(stream, overstrike.size))
+            store.overstrikes[(line, col)] = list(read_exact(stream, size).decode('utf-8'))
+        return store
+    
+    def line_codes(self, first_line, last_line, width):
+        """Retorna um array NumPy (linhas, width) com os códigos das linhas"""
+        codes = np.zeros((last_line - first_line, width), dtype=np.uint32)
+        for line in range(first_line, min(last_line, len(self.lines))):
+            line_codes = self.lines[line]
+            if line_codes is not None:
+                row = np.frombuffer(line_codes, dtype=np.uint32)[:width]
+                codes[line - first_line, :len(row)] = row
+        return codes
+    
+    def used_chars(self):
+        """Retorna o conjunto de caracteres batidos na página, sem montar
+        os códigos de todas as linhas de uma vez"""
+        codes = set()
+        for line_codes in self.lines:
+            if line_codes is not None:
+                codes.update(np.unique(np.frombuffer(line_codes, dtype=np.uint32)).tolist())
+        codes.discard(0)
+        chars = {chr(code) for code in codes}
+        for extras in self.overstrikes.values():
+            chars.update(extras)
+        return chars
+    
+    def line_text(self, line):
+        """Retorna o texto visível da linha, usando o último caractere batido"""
+        codes = self.line(line)
+        if codes is None:
+            return ""
+        chars = []
+        for col in range(self.max_col(line) + 1):
+            code = codes[col]
+            if not code:
+                chars.append(' ')
+            elif (line, col) in self.overstrikes:
+                chars.append(self.overstrikes[(line, col)][-1])
+            else:
+                chars.append(chr(code))
+        return ''.join(chars).rstrip()
+
+class GlyphAtlas:
+    """
+    Atlas de glifos: uma única textura dividida em células do tamanho de um
+    caractere. Cada glifo é renderizado na primeira vez em que é usado e as
+    células menos usadas recentemente são reaproveitadas quando o atlas enche.
+    """
+    
+    def __init__(self, font, color, cell_width, cell_height, columns=32, rows=16):
+        self.font = font
+        self.color = color
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        self.columns = columns
+        self.surface = pygame.Surface((columns * cell_width, rows * cell_height), pygame.SRCALPHA)
+        self.capacity = columns * rows
+        self.slots = OrderedDict()  # {caractere: Rect da célula}, em ordem de uso
+    
+    def get(self, char):
+        """Retorna a célula do glifo no atlas, renderizando-o se necessário"""
+        rect = self.slots.get(char)
+        if rect is not None:
+            self.slots.move_to_end(char)
+            return rect
+        
+        if len(self.slots) < self.capacity:
+            index = len(self.slots)
+            rect = pygame.Rect((index % self.columns) * self.cell_width,
+                               (index // self.columns) * self.cell_height,
+                               self.cell_width, self.cell_height)
+        else:
+            # Reaproveitar a célula do glifo usado há mais tempo
+            _, rect = self.slots.popitem(last=False)
+        
+        self.surface.fill((0, 0, 0, 0), rect)
+        try:
+            text_surface = self.font.render(char, True, self.color)
+            # Centralizar o caractere na célula, sem invadir as vizinhas
+            x = rect.x + (self.cell_width - text_surface.get_width()) // 2
+            y = rect.y + (self.cell_height - text_surface.get_height()) // 2
+            self.surface.set_clip(rect)
+            self.surface.blit(text_surface, (x, y))
+            self.surface.set_clip(None)
+        except:
+            pass  # Caractere que não pode ser renderizado fica com a célula vazia
+        
+        self.slots[char] = rect
+        return rect
+    
+    def blit(self, target, char, position):
+        """Desenha o glifo na superfície de destino"""
+        target.blit(self.surface, position, self.get(char))
+
+class PageRasterizer:
+    """
+    Rasteriza linhas da página num array NumPy a partir de uma tabela de
+    bitmaps de glifos (cobertura de tinta entre 0 e 255). Cada camada de toques
+    é composta de uma vez com indexação vetorizada; toques sobrepostos somam
+    tinta multiplicando a transparência, como numa máquina de escrever.
+    """
+    
+    def __init__(self, cell_width, cell_height, bg_color, text_color):
+        self.cell_width = cell_width
+        self.cell_height = cell_height
+        # Paleta com as 256 intensidades de tinta entre o fundo e o texto
+        ink = np.arange(256, dtype=np.float32)[:, None] / 255
+        bg = np.array(bg_color, dtype=np.float32)
+        self.palette = (bg + ink * (np.array(text_color, dtype=np.float32) - bg)).round().astype(np.uint8)
+        self.blank = np.zeros((cell_height, cell_width), dtype=np.uint8)
+        self.glyphs = {}  # {caractere: cobertura (altura, largura)}
+    
+    def glyph(self, char):
+        """Retorna o bitmap do glifo (vazio se não estiver na tabela)"""
+        return self.glyphs.get(char, self.blank)
+    
+    def rasterize(self, codes, overstrikes, first_line=0):
+        """
+        Retorna a cobertura de tinta (linhas * altura, colunas * largura)
+        para o array de códigos e as sobreposições {(linha, coluna): [extras]}.
+        """
+        rows, columns = codes.shape
+        unique_codes, glyph_ids = np.unique(codes, return_inverse=True)
+        table = np.stack([self.glyph(chr(code)) if code else self.blank for code in unique_codes])
+        
+        # (linhas, colunas, altura, largura) -> (linhas * altura, colunas * largura)
+        cells = table[glyph_ids.reshape(rows, columns)]
+        coverage = cells.transpose(0, 2, 1, 3).reshape(rows * self.cell_height, columns * self.cell_width)
+        
+        for (line, col), chars in overstrikes.items():
+            row = line - first_line
+            if not (0 <= row < rows and col < columns):
+                continue
+            y = row * self.cell_height
+            x = col * self.cell_width
+            cell = coverage[y:y + self.cell_height, x:x + self.cell_width]
+            for char in chars:
+                transparency = (255 - cell.astype(np.uint16)) * (255 - self.glyph(char).astype(np.uint16))
+                cell[:] = 255 - (transparency + 127) // 255
+        return coverage
+    
+    def render_image(self, codes, overstrikes, first_line, left, top, width, height):
+        """Retorna a imagem RGB (height, width) com as linhas rasterizadas
+        a partir da posição (left, top)"""
+        coverage = self.rasterize(codes, overstrikes, first_line)
+        page = np.empty((height, width, 3), dtype=np.uint8)
+        page[:] = self.palette[0]
+        page[top:top + coverage.shape[0], left:left + coverage.shape[1]] = self.colorize(coverage)
+        return page
+    
+    def colorize(self, coverage):
+        """Converte a cobertura de tinta numa imagem RGB"""
+        rgb = np.empty(coverage.shape + (3,), dtype=np.uint8)
+        for channel in range(3):
+            rgb[..., channel] = self.palette[:, channel].take(coverage)
+        return rgb
+
+# Rasterizador de cada processo do pool, recebido uma única vez
+worker_rasterizer = None
+
+def init_page_worker(rasterizer):
+    """Inicializa um processo do pool com a tabela de glifos"""
+    global worker_rasterizer
+    worker_rasterizer = rasterizer
+
+def save_page_image(file_path, codes, overstrikes, first_line, left, top, width, height):
+    """Rasteriza uma página e grava-a em PNG (executado nos processos do pool)"""
+    page = worker_rasterizer.render_image(codes, overstrikes, first_line, left, top, width, height)
+    Image.fromarray(page, 'RGB').save(file_path)
+    return file_path
+
 class TypewriterSimulator:
     def __init__(self):
         pygame.init()
@@ -31,14 +392,15 @@ class TypewriterSimulator:
         self.top_margin = 80
         self.right_margin = 80
         self.bottom_margin = 80
-        self.max_chars_per_line = 80
+        self.page_lines = 25  # Linhas por folha
         
-        # Estado do cursor
-        self.cursor_line = 0
-        self.cursor_col = 0
+        # Documento (regras da máquina e cursor) sobre a matriz de caracteres,
+        # onde cada posição pode ter múltiplos caracteres sobrepostos
+        self.document = TypewriterDocument(PageStore(80), width=80)  # 80 caracteres por linha
+        self.document.subscribe(self.on_document_change)
         
-        # Matriz de caracteres - cada posição pode ter múltiplos caracteres sobrepostos
-        self.char_matrix = {}  # {(linha, coluna): [lista_de_caracteres]}
+        # Primeira linha do documento visível na janela
+        self.scroll_line = 0
         
         # Estado para caracteres compostos (dead keys)
         self.dead_key = None  # Armazena o caractere morto atual
@@ -46,6 +408,7 @@ class TypewriterSimulator:
         # Estado do arquivo atual
         self.current_file = None
         self.is_modified = False
+        self.compress_state = DEFAULT_STATE_COMPRESSION  # Comprime o corpo dos arquivos .typewriter
         
         # Configurações da fonte
         try:
@@ -59,67 +422,86 @@ class TypewriterSimulator:
                 except:
                     self.font = pygame.font.Font(None, self.font_size)
         
-        # Gerar sprites de caracteres
-        self.char_sprites = self.generate_char_sprites()
+        # Atlas de glifos, preenchido sob demanda
+        self.glyphs = GlyphAtlas(self.font, self.text_color, self.char_width, self.line_height)
         
-        # Para o cursor piscante
+        # Rasterizador da exportação em imagem (usa os mesmos glifos da tela)
+        self.rasterizer = PageRasterizer(self.char_width, self.line_height, self.bg_color, self.text_color)
+        
+        # Para o cursor piscante (baseado no relógio, não em quadros)
         self.cursor_visible = True
-        self.cursor_timer = 0
+        self.blink_interval = 500  # ms
+        self.blink_start = pygame.time.get_ticks()
+        self.blink_event = pygame.USEREVENT
         
-        # Clock para controle de FPS
-        self.clock = pygame.time.Clock()
+        # Superfície da página desenhada fora da tela; só recebe os novos toques
+        self.page_surface = None
+        self.pending_strikes = []  # [(linha, coluna, caractere)] ainda não compostos
+        self.last_cursor_rect = None
         
         # Inicializar Tkinter para diálogos de arquivo (oculto)
         self.root = tk.Tk()
         self.root.withdraw()  # Ocultar janela principal do Tkinter
         
-    def generate_char_sprites(self):
-        """Gera sprites para todos os caracteres"""
-        sprites = {}
-        
-        # Caracteres básicos para gerar sprites
-        chars = string.ascii_letters + string.digits + string.punctuation + " "
-        
-        # Adicionar caracteres especiais comuns
-        special_chars = "áàâãäéèêëíìîïóòôõöúùûüçñÁÀÂÃÄÉÈÊËÍÌÎÏÓÒÔÕÖÚÙÛÜÇÑ"
-        chars += special_chars
-        
-        for char in chars:
-            try:
-                # Criar surface para o caractere
-                char_surface = pygame.Surface((self.char_width, self.line_height), pygame.SRCALPHA)
-                
-                # Renderizar caractere
-                if char != ' ':  # Não renderizar espaço
-                    text_surface = self.font.render(char, True, self.text_color)
-                    # Centralizar o caractere no sprite
-                    x = (self.char_width - text_surface.get_width()) // 2
-                    y = (self.line_height - text_surface.get_height()) // 2
-                    char_surface.blit(text_surface, (x, y))
-                
-                sprites[char] = char_surface
-            except:
-                # Se falhar ao renderizar o caractere, criar sprite vazio
-                sprites[char] = pygame.Surface((self.char_width, self.line_height), pygame.SRCALPHA)
-            
-        return sprites
+    @property
+    def char_matrix(self):
+        return self.document.lines
+    
+    @char_matrix.setter
+    def char_matrix(self, store):
+        self.document.lines = store
+    
+    @property
+    def max_chars_per_line(self):
+        return self.document.width
+    
+    @max_chars_per_line.setter
+    def max_chars_per_line(self, width):
+        self.document.width = width
+    
+    @property
+    def cursor_line(self):
+        return self.document.line
+    
+    @cursor_line.setter
+    def cursor_line(self, line):
+        self.document.line = line
+    
+    @property
+    def cursor_col(self):
+        return self.document.col
+    
+    @cursor_col.setter
+    def cursor_col(self, col):
+        self.document.col = col
+    
+    def on_document_change(self, event, *args):
+        """Agenda a composição dos caracteres batidos no documento"""
+        if event == STRUCK:
+            if self.page_surface is not None:
+                self.pending_strikes.append(args)
+            self.is_modified = True
     
     def get_char_at_position(self, line, col):
         """Retorna a lista de caracteres na posição especificada"""
-        return self.char_matrix.get((line, col), [])
+        return self.char_matrix.get(line, col)
     
     def add_char_at_position(self, line, col, char):
         """Adiciona um caractere na posição especificada (sobrepondo)"""
-        if (line, col) not in self.char_matrix:
-            self.char_matrix[(line, col)] = []
-        self.char_matrix[(line, col)].append(char)
-        self.is_modified = True
+        self.document.strike_at(line, col, char)
+    
+    def invalidate_page(self):
+        """Descarta a superfície da página para redesenhá-la por completo"""
+        self.page_surface = None
+        self.pending_strikes = []
     
     def clear_document(self):
         """Limpa o documento atual"""
-        self.char_matrix = {}
+        self.char_matrix = PageStore(self.max_chars_per_line)
+        self.invalidate_page()
         self.cursor_line = 0
         self.cursor_col = 0
+        self.scroll_line = 0
         self.current_file = None
         self.is_modified = False
         self.dead_key = None
@@ -190,15 +572,7 @@ class TypewriterSimulator:
             )
             
             if file_path:
-                state = {
-                    'char_matrix': {f"{k[0]},{k[1]}": v for k, v in self.char_matrix.items()},
-                    'cursor_line': self.cursor_line,
-                    'cursor_col': self.cursor_col,
-                    'max_chars_per_line': self.max_chars_per_line
-                }
-                
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    json.dump(state, f, indent=2, ensure_ascii=False)
+                saver.save(file_path, self.write_state, binary=True)
                 
                 self.current_file = file_path
                 self.is_modified = False
@@ -207,6 +581,58 @@ class TypewriterSimulator:
         except Exception as e:
             print(f"Erro ao salvar: {str(e)}")
     
+    def write_state(self, f):
+        """Grava o estado no formato binário .typewriter"""
+        flags = STATE_FLAG_ZLIB if self.compress_state else 0
+        f.write(STATE_HEADER.pack(STATE_MAGIC, STATE_VERSION, flags,
+                                  self.cursor_line, self.cursor_col, self.max_chars_per_line))
+        if self.compress_state:
+            stream = ZlibWriter(f)
+            self.char_matrix.write_binary(stream)
+            stream.close()
+        else:
+            self.char_matrix.write_binary(f)
+    
+    def read_state(self, f):
+        """Lê um estado binário ou, se não for, um estado JSON antigo"""
+        header = f.read(STATE_HEADER.size)
+        if not header.startswith(STATE_MAGIC):
+            f.seek(0)
+            self.read_json_state(f)
+            return
+        
+        _, version, flags, cursor_line, cursor_col, max_chars = STATE_HEADER.unpack(header)
+        if version > STATE_VERSION:
+            raise ValueError(f"versão de estado não suportada: {version}")
+        
+        stream = ZlibReader(f) if flags & STATE_FLAG_ZLIB else f
+        self.char_matrix = PageStore.read_binary(stream, max_chars, version)
+        self.invalidate_page()
+        
+        self.cursor_line = cursor_line
+        self.cursor_col = cursor_col
+        self.max_chars_per_line = max_chars
+    
+    def read_json_state(self, f):
+        """Importa um estado salvo no formato JSON antigo"""
+        state = json.load(f)
+        
+        # Restaurar matriz de caracteres
+        self.char_matrix = PageStore(state.get('max_chars_per_line', self.max_chars_per_line))
+        for pos_str, chars in state['char_matrix'].items():
+            line, col = map(int, pos_str.split(','))
+            for char in chars:
+                self.char_matrix.add(line, col, char)
+        self.invalidate_page()
+        
+        # Restaurar cursor
+        self.cursor_line = state['cursor_line']
+        self.cursor_col = state['cursor_col']
+        
+        # Restaurar configurações se existirem
+        if 'max_chars_per_line' in state:
+            self.max_chars_per_line = state['max_chars_per_line']
+    
     def load_state_file(self):
         """Carrega um estado salvo do simulador"""
         try:
@@ -219,22 +645,8 @@ class TypewriterSimulator:
             )
             
             if file_path:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    state = json.load(f)
-                
-                # Restaurar matriz de caracteres
-                self.char_matrix = {}
-                for pos_str, chars in state['char_matrix'].items():
-                    line, col = map(int, pos_str.split(','))
-                    self.char_matrix[(line, col)] = chars
-                
-                # Restaurar cursor
-                self.cursor_line = state['cursor_line']
-                self.cursor_col = state['cursor_col']
-                
-                # Restaurar configurações se existirem
-                if 'max_chars_per_line' in state:
-                    self.max_chars_per_line = state['max_chars_per_line']
+                with open(file_path, 'rb') as f:
+                    self.read_state(f)
                 
                 self.current_file = file_path
                 self.is_modified = False
@@ -256,47 +668,27 @@ class TypewriterSimulator:
             )
             
             if file_path:
-                # Encontrar dimensões do documento
-                if not self.char_matrix:
-                    with open(file_path, 'w', encoding='utf-8') as f:
-                        f.write("")
-                    return
-                
-                max_line = max(pos[0] for pos in self.char_matrix.keys())
-                
-                lines = []
-                for line_num in range(max_line + 1):
-                    line_chars = []
-                    max_col = -1
-                    
-                    # Encontrar última coluna com conteúdo nesta linha
-                    for pos in self.char_matrix.keys():
-                        if pos[0] == line_num:
-                            max_col = max(max_col, pos[1])
-                    
-                    # Construir linha
-                    if max_col >= 0:
-                        for col in range(max_col + 1):
-                            chars = self.char_matrix.get((line_num, col), [])
-                            if chars:
-                                # Usar o último caractere se houver sobreposição
-                                line_chars.append(chars[-1])
-                            else:
-                                line_chars.append(' ')
-                    
-                    lines.append(''.join(line_chars).rstrip())
-                
-                # Remover linhas vazias do final
-                while lines and not lines[-1]:
-                    lines.pop()
-                
-                with open(file_path, 'w', encoding='utf-8') as f:
-                    f.write('\n'.join(lines))
+                saver.save(file_path, self.write_text)
                 
                 filename = os.path.basename(file_path)
         except Exception as e:
             print(f"Erro ao exportar: {str(e)}")
     
+    def write_text(self, f):
+        """Grava o texto visível linha por linha; linhas vazias só são escritas
+        quando houver texto depois delas (remove as linhas vazias do final)"""
+        started = False
+        blank_lines = 0
+        for line_num in range(self.char_matrix.max_line() + 1):
+            text = self.char_matrix.line_text(line_num)
+            if not text:
+                blank_lines += 1
+                continue
+            f.write('\n' * (blank_lines + started))
+            f.write(text)
+            started = True
+            blank_lines = 0
+    
     def handle_dead_key(self, char):
         """Trata caracteres compostos (dead keys)"""
         if self.dead_key is None:
@@ -325,8 +717,10 @@ class TypewriterSimulator:
                 self.dead_key = None
                 return char
     
-    def handle_events(self):
-        for event in pygame.event.get():
+    def handle_events(self, events=None):
+        if events is None:
+            events = pygame.event.get()
+        for event in events:
             if event.type == pygame.QUIT:
                 return False
             
@@ -335,52 +729,45 @@ class TypewriterSimulator:
                 self.width = event.w
                 self.height = event.h
                 self.screen = pygame.display.set_mode((self.width, self.height), pygame.RESIZABLE)
+                self.invalidate_page()
+            
+            elif event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED,
+                                pygame.WINDOWSHOWN, pygame.WINDOWRESTORED):
+                # A janela foi descoberta (ex.: após um diálogo do Tk):
+                # o conteúdo da tela se perdeu e precisa ser redesenhado
+                self.invalidate_page()
             
             elif event.type == pygame.KEYDOWN:
                 keys = pygame.key.get_pressed()
                 
                 if event.key == pygame.K_RETURN:
                     # Nova linha - retorno do carro
-                    self.cursor_line += 1
-                    self.cursor_col = 0
+                    self.document.carriage_return()
                     # Resetar dead key se houver
                     self.dead_key = None
                     self.is_modified = True
                     
                 elif event.key == pygame.K_BACKSPACE:
                     # Backspace apenas move o cursor para trás (não destrutivo)
-                    if self.cursor_col > 0:
-                        self.cursor_col -= 1
-                    elif self.cursor_line > 0:
-                        self.cursor_line -= 1
-                        self.cursor_col = self.max_chars_per_line - 1
+                    self.document.move_left()
                     # Resetar dead key se houver
                     self.dead_key = None
                         
                 elif event.key == pygame.K_LEFT:
                     # Mover cursor para esquerda
-                    if self.cursor_col > 0:
-                        self.cursor_col -= 1
-                    elif self.cursor_line > 0:
-                        self.cursor_line -= 1
-                        self.cursor_col = self.max_chars_per_line - 1
+                    self.document.move_left()
                         
                 elif event.key == pygame.K_RIGHT:
                     # Mover cursor para direita
-                    if self.cursor_col < self.max_chars_per_line - 1:
-                        self.cursor_col += 1
-                    else:
-                        self.cursor_line += 1
-                        self.cursor_col = 0
+                    self.document.move_right()
                         
                 elif event.key == pygame.K_UP:
                     # Mover cursor para linha acima
-                    if self.cursor_line > 0:
-                        self.cursor_line -= 1
+                    self.document.move_up()
                         
                 elif event.key == pygame.K_DOWN:
                     # Mover cursor para linha abaixo
-                    self.cursor_line += 1
+                    self.document.move_down()
                 
                 # Atalhos de teclado
                 elif event.key == pygame.K_n and keys[pygame.K_LCTRL]:
@@ -409,16 +796,23 @@ class TypewriterSimulator:
                         # Ctrl+S - Salvar como imagem
                         self.save_image()
                     
+                elif event.key == pygame.K_p and keys[pygame.K_LCTRL]:
+                    # Ctrl+P - Exportar uma imagem por folha
+                    self.save_pages()
+                    
                 elif event.key == pygame.K_TAB:
                     # Tab move cursor para próxima posição de tabulação (múltiplo de 8)
-                    next_tab = ((self.cursor_col // 8) + 1) * 8
-                    if next_tab < self.max_chars_per_line:
-                        self.cursor_col = next_tab
+                    self.document.tab()
                     self.is_modified = True
                     
                 elif event.key == pygame.K_F1:
                     # F1 - Mostrar ajuda
                     self.show_help()
+                
+                elif event.key == pygame.K_F2:
+                    # F2 - Ligar/desligar a compressão do estado salvo
+                    self.compress_state = not self.compress_state
+                    print(f"Compressão do estado: {'ligada' if self.compress_state else 'desligada'}")
                     
                 else:
                     # Inserir caractere
@@ -427,20 +821,13 @@ class TypewriterSimulator:
                         final_char = self.handle_dead_key(event.unicode)
                         
                         if final_char is not None:  # Só adicionar se não for um dead key pendente
-                            # Verificar se não excede o limite da linha - PARAR no final
-                            if self.cursor_col < self.max_chars_per_line:
-                                self.add_char_at_position(self.cursor_line, self.cursor_col, final_char)
-                                self.cursor_col += 1
-                            # Se chegou no limite, simplesmente não adiciona o caractere
-                            # e não move o cursor (simula travamento da máquina)
+                            # No limite da linha o caractere não é batido e o cursor
+                            # não se move (simula travamento da máquina)
+                            self.document.strike(final_char)
                     
                     elif event.key == pygame.K_SPACE:
-                        # Tratar espaço separadamente
-                        if self.cursor_col < self.max_chars_per_line:
-                            self.add_char_at_position(self.cursor_line, self.cursor_col, ' ')
-                            self.cursor_col += 1
-                        # Se chegou no limite, simplesmente não adiciona o espaço
-                        # e não move o cursor
+                        # Tratar espaço separadamente; no limite não é batido
+                        self.document.strike(' ')
                         
                         # Resetar dead key se houver
                         self.dead_key = None
@@ -456,82 +843,143 @@ Ctrl+Shift+O: Abrir estado do simulador
 Ctrl+S: Salvar como imagem
 Ctrl+Shift+S: Salvar estado
 Ctrl+Alt+S: Exportar para texto
-F1: Mostrar ajuda"""
+Ctrl+P: Exportar páginas como imagens
+F1: Mostrar ajuda
+F2: Ligar/desligar a compressão do estado salvo"""
         
         print(help_text)
     
-    def draw(self):
-        # Limpar tela
-        self.screen.fill(self.bg_color)
+    def visible_lines(self):
+        """Retorna quantas linhas do documento cabem na janela abaixo da
+        margem superior (25 na altura padrão, uma folha inteira)"""
+        return max(1, (self.height - self.top_margin) // self.line_height)
+    
+    def adjust_scroll(self):
+        """Ajusta o scroll para manter o cursor visível"""
+        old_scroll = self.scroll_line
+        if self.cursor_line < self.scroll_line:
+            self.scroll_line = self.cursor_line
+        elif self.cursor_line >= self.scroll_line + self.visible_lines():
+            self.scroll_line = self.cursor_line - self.visible_lines() + 1
+        
+        if self.scroll_line != old_scroll:
+            self.invalidate_page()
+    
+    def line_to_y(self, line):
+        """Converte uma linha do documento na coordenada y da janela"""
+        return self.top_margin + (line - self.scroll_line) * self.line_height
+    
+    def draw_char(self, surface, line, col, char):
+        """Compõe um caractere batido na superfície e retorna a área afetada"""
+        x = self.left_margin + col * self.char_width
+        y = self.line_to_y(line)
+        
+        if char != ' ':  # Não desenhar espaço
+            self.glyphs.blit(surface, char, (x, y))
+        
+        return pygame.Rect(x, y, self.char_width, self.line_height)
+    
+    def render_page_surface(self):
+        """Redesenha a página inteira na superfície fora da tela"""
+        self.page_surface = pygame.Surface((self.width, self.height))
+        self.page_surface.fill(self.bg_color)
         
         # Desenhar margens da "folha"
-        self.draw_page_margins()
+        self.draw_page_margins(self.page_surface)
         
-        # Desenhar todos os caracteres
-        for (line, col), chars in self.char_matrix.items():
-            x = self.left_margin + col * self.char_width
-            y = self.top_margin + line * self.line_height
-            
-            # Desenhar todos os caracteres sobrepostos na posição
+        # Desenhar os caracteres sobrepostos apenas das linhas visíveis
+        last_line = self.scroll_line + self.visible_lines()
+        for (line, col), chars in self.char_matrix.items(self.scroll_line, last_line):
             for char in chars:
-                if char in self.char_sprites:
-                    self.screen.blit(self.char_sprites[char], (x, y))
-                else:
-                    # Para caracteres não pré-gerados, renderizar diretamente
-                    try:
-                        if char != ' ':
-                            text_surface = self.font.render(char, True, self.text_color)
-                            char_x = x + (self.char_width - text_surface.get_width()) // 2
-                            char_y = y + (self.line_height - text_surface.get_height()) // 2
-                            self.screen.blit(text_surface, (char_x, char_y))
-                    except:
-                        pass  # Ignorar caracteres que não podem ser renderizados
+                self.draw_char(self.page_surface, line, col, char)
+        
+        self.pending_strikes = []
+    
+    def get_cursor_rect(self):
+        """Retorna a área ocupada pelo cursor na tela"""
+        cursor_x = self.left_margin + self.cursor_col * self.char_width
+        cursor_y = self.line_to_y(self.cursor_line)
+        return pygame.Rect(cursor_x - 1, cursor_y, 3, self.line_height + 1)
+    
+    def draw(self):
+        """Atualiza na tela apenas os novos toques e o cursor"""
+        self.adjust_scroll()
+        full_redraw = self.page_surface is None
+        if full_redraw:
+            self.render_page_surface()
+            dirty_rects = [self.screen.get_rect()]
+        else:
+            # Compor os novos toques visíveis na página uma única vez
+            last_line = self.scroll_line + self.visible_lines()
+            dirty_rects = [self.draw_char(self.page_surface, line, col, char)
+                           for line, col, char in self.pending_strikes
+                           if self.scroll_line <= line < last_line]
+            self.pending_strikes = []
+        
+        cursor_rect = self.get_cursor_rect() if self.cursor_visible else None
+        if cursor_rect != self.last_cursor_rect:
+            dirty_rects.extend(rect for rect in (self.last_cursor_rect, cursor_rect) if rect)
+        if not dirty_rects:
+            return
+        
+        # Restaurar as áreas alteradas a partir da página
+        for rect in dirty_rects:
+            self.screen.blit(self.page_surface, rect, rect)
         
         # Desenhar cursor
-        if self.cursor_visible:
-            cursor_x = self.left_margin + self.cursor_col * self.char_width
-            cursor_y = self.top_margin + self.cursor_line * self.line_height
+        if cursor_rect:
             pygame.draw.line(self.screen, self.cursor_color, 
-                           (cursor_x, cursor_y), 
-                           (cursor_x, cursor_y + self.line_height), 2)
+                           (cursor_rect.x + 1, cursor_rect.y), 
+                           (cursor_rect.x + 1, cursor_rect.y + self.line_height), 2)
+        self.last_cursor_rect = cursor_rect
         
-        pygame.display.flip()
+        if full_redraw:
+            pygame.display.flip()
+        else:
+            pygame.display.update(dirty_rects)
     
-    def draw_page_margins(self):
+    def draw_page_margins(self, surface):
         """Desenha as margens da folha para mostrar os limites"""
-        # Calcular dimensões da área de texto
+        # Calcular dimensões da área de texto (acompanha o scroll)
         text_width = self.max_chars_per_line * self.char_width
-        text_height = 25 * self.line_height  # Altura para 25 linhas
+        text_height = self.page_lines * self.line_height
+        page_top = self.line_to_y(0)
         
         # Desenhar retângulo das margens
         margin_color = (80, 80, 80)  # Cor das margens
         
         # Margem esquerda
-        pygame.draw.line(self.screen, margin_color, 
-                        (self.left_margin, self.top_margin), 
-                        (self.left_margin, self.top_margin + text_height), 1)
+        pygame.draw.line(surface, margin_color, 
+                        (self.left_margin, page_top), 
+                        (self.left_margin, page_top + text_height), 1)
         
         # Margem direita
-        pygame.draw.line(self.screen, margin_color, 
-                        (self.left_margin + text_width, self.top_margin), 
-                        (self.left_margin + text_width, self.top_margin + text_height), 1)
+        pygame.draw.line(surface, margin_color, 
+                        (self.left_margin + text_width, page_top), 
+                        (self.left_margin + text_width, page_top + text_height), 1)
         
         # Margem superior
-        pygame.draw.line(self.screen, margin_color, 
-                        (self.left_margin, self.top_margin), 
-                        (self.left_margin + text_width, self.top_margin), 1)
+        pygame.draw.line(surface, margin_color, 
+                        (self.left_margin, page_top), 
+                        (self.left_margin + text_width, page_top), 1)
         
         # Margem inferior
-        pygame.draw.line(self.screen, margin_color, 
-                        (self.left_margin, self.top_margin + text_height), 
-                        (self.left_margin + text_width, self.top_margin + text_height), 1)
+        pygame.draw.line(surface, margin_color, 
+                        (self.left_margin, page_top + text_height), 
+                        (self.left_margin + text_width, page_top + text_height), 1)
     
     def update_cursor(self):
-        # Fazer cursor piscar
-        self.cursor_timer += 1
-        if self.cursor_timer >= 30:  # Piscar a cada 30 frames
-            self.cursor_visible = not self.cursor_visible
-            self.cursor_timer = 0
+        """Faz o cursor piscar; retorna os ms até a próxima troca de estado"""
+        elapsed = pygame.time.get_ticks() - self.blink_start
+        self.cursor_visible = (elapsed // self.blink_interval) % 2 == 0
+        return self.blink_interval - elapsed % self.blink_interval
+    
+    def load_glyph_bitmaps(self, chars):
+        """Copia do atlas para o rasterizador os glifos ainda não carregados"""
+        for char in chars - self.rasterizer.glyphs.keys():
+            if char != ' ':
+                cell = self.glyphs.surface.subsurface(self.glyphs.get(char))
+                self.rasterizer.glyphs[char] = pygame.surfarray.array_alpha(cell).T.copy()
     
     def save_image(self):
         # Gerar nome do arquivo com data e hora
@@ -540,54 +988,74 @@ F1: Mostrar ajuda"""
         filename = f"typewriter_output_{timestamp}.png"
         
         # Calcular dimensões necessárias
-        max_line = max([line for line, col in self.char_matrix.keys()] + [self.cursor_line]) if self.char_matrix else 0
+        max_line = max(self.char_matrix.max_line(), self.cursor_line)
         img_width = self.left_margin + self.right_margin + self.max_chars_per_line * self.char_width
         img_height = self.top_margin + self.bottom_margin + (max_line + 1) * self.line_height
         
-        # Criar imagem PIL
-        img = Image.new('RGB', (img_width, img_height), (40, 40, 40))
-        draw = ImageDraw.Draw(img)
-        
-        # Tentar usar uma fonte melhor para a imagem
-        try:
-            pil_font = ImageFont.truetype("Pica.ttf", self.font_size)
-        except:
-            try:
-                pil_font = ImageFont.truetype("cour.ttf", self.font_size)  # Courier New no Windows
-            except:
-                try:
-                    pil_font = ImageFont.truetype("Courier New.ttf", self.font_size)
-                except:
-                    pil_font = ImageFont.load_default()
-        
-        # Desenhar todos os caracteres na imagem
-        for (line, col), chars in self.char_matrix.items():
-            x = self.left_margin + col * self.char_width
-            y = self.top_margin + line * self.line_height
-            
-            # Desenhar todos os caracteres sobrepostos
-            for char in chars:
-                if char != ' ':  # Não desenhar espaços
-                    try:
-                        draw.text((x, y), char, fill=(240, 235, 220), font=pil_font)
-                    except:
-                        # Se falhar, tentar com fonte padrão
-                        try:
-                            draw.text((x, y), char, fill=(240, 235, 220))
-                        except:
-                            pass  # Ignorar caracteres que não podem ser desenhados
+        # Rasterizar as linhas e aplicar as margens
+        codes = self.char_matrix.line_codes(0, max_line + 1, self.max_chars_per_line)
+        self.load_glyph_bitmaps(self.char_matrix.used_chars())
+        page = self.rasterizer.render_image(codes, self.char_matrix.overstrikes, 0, self.left_margin,
+                                            self.top_margin, img_width, img_height)
+        img = Image.fromarray(page, 'RGB')
         
         # Salvar imagem
         img.save(filename)
         print(f"Imagem salva: {filename}")
     
+    def save_pages(self):
+        """Exporta o documento em folhas de page_lines linhas, uma imagem PNG
+        numerada por folha, rasterizadas em paralelo num pool de processos"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        max_line = max(self.char_matrix.max_line(), self.cursor_line)
+        page_count = max_line // self.page_lines + 1
+        img_width = self.left_margin + self.right_margin + self.max_chars_per_line * self.char_width
+        img_height = self.top_margin + self.bottom_margin + self.page_lines * self.line_height
+        
+        # Sobreposições agrupadas por folha numa única passagem
+        page_overstrikes = {}
+        for pos, chars in self.char_matrix.overstrikes.items():
+            page_overstrikes.setdefault(pos[0] // self.page_lines, {})[pos] = chars
+        
+        # A tabela de glifos vai uma única vez para cada processo do pool
+        self.load_glyph_bitmaps(self.char_matrix.used_chars())
+        workers = os.cpu_count() or 1
+        with ProcessPoolExecutor(max_workers=workers, initializer=init_page_worker,
+                                 initargs=(self.rasterizer,)) as pool:
+            # No máximo uma folha por processo fica montada à espera: a
+            # próxima só é montada quando a mais antiga termina
+            in_flight = deque()
+            for page_num in range(page_count):
+                if len(in_flight) >= workers:
+                    self.report_page(in_flight.popleft())
+                first_line = page_num * self.page_lines
+                last_line = first_line + self.page_lines
+                codes = self.char_matrix.line_codes(first_line, last_line, self.max_chars_per_line)
+                filename = f"typewriter_output_{timestamp}_p{page_num + 1:03d}.png"
+                in_flight.append(pool.submit(
+                    save_page_image, filename, codes, page_overstrikes.pop(page_num, {}),
+                    first_line, self.left_margin, self.top_margin, img_width, img_height))
+            
+            while in_flight:
+                self.report_page(in_flight.popleft())
+    
+    def report_page(self, future):
+        """Espera uma folha exportada e informa o resultado"""
+        try:
+            print(f"Imagem salva: {future.result()}")
+        except Exception as e:
+            print(f"Erro ao exportar página: {str(e)}")
+    
     def run(self):
+        """Loop principal orientado a eventos: dorme até haver entrada ou
+        até o próximo piscar do cursor, e só então redesenha"""
         running = True
         while running:
-            running = self.handle_events()
-            self.update_cursor()
+            next_blink = self.update_cursor()
             self.draw()
-            self.clock.tick(60)
+            # Acorda novamente na próxima troca do cursor, se nada acontecer antes
+            pygame.time.set_timer(self.blink_event, max(1, next_blink), 1)
+            running = self.handle_events([pygame.event.wait()] + pygame.event.get())
         
         pygame.quit()
         sys.exit()
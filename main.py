@@ -1,34 +1,231 @@
 #!/usr/bin/env python3
+import asyncio
 import curses
 import os
 import sys
 import threading
 import time
+import signal
 import subprocess
+import ctypes
+import struct
 from datetime import datetime
 
+from atomic_save import saver
+from buffers import ChunkedBuffer, MappedBuffer
+from document import Document, STRUCK, LINE_ADDED
+
+class EditJournal:
+    """
+    Diário de edições gravado ao lado do arquivo (<arquivo>.journal).
+    Cada sobrescrita ou nova linha vira um registro curto anexado ao diário,
+    então o salvamento automático grava só o que foi digitado. O diário é
+    compactado no arquivo principal quando fica grande ou antigo demais e é
+    reaplicado ao carregar o arquivo, recuperando edições após uma falha.
+    Os registros usam posições absolutas e podem ser reaplicados sem efeito
+    colateral caso a compactação seja interrompida.
+    """
+    COMPACT_SIZE = 64 * 1024  # Bytes no diário antes de compactar
+    COMPACT_INTERVAL = 300  # Segundos entre compactações
+    
+    def __init__(self, file_path):
+        self.path = file_path + '.journal'
+        self.pending = []  # Registros ainda não gravados no disco
+        self.lock = threading.Lock()
+        self.last_compaction = time.time()
+        try:
+            self.size = os.path.getsize(self.path)
+        except OSError:
+            self.size = 0
+    
+    def record_overwrite(self, line_num, col, char):
+        """Registra a sobrescrita de um caractere"""
+        with self.lock:
+            self.pending.append(f"o {line_num} {col} {char}\n")
+    
+    def record_newline(self, line_num):
+        """Registra a criação de uma nova linha no final do documento"""
+        with self.lock:
+            self.pending.append(f"n {line_num}\n")
+    
+    def take_pending(self):
+        """Retira os registros ainda não gravados"""
+        with self.lock:
+            records, self.pending = self.pending, []
+        return records
+    
+    def requeue(self, records):
+        """Devolve registros retirados cuja gravação falhou"""
+        with self.lock:
+            self.pending[:0] = records
+    
+    def append(self, records):
+        """Anexa registros ao diário no disco"""
+        if not records:
+            return
+        data = ''.join(records).encode('utf-8')
+        with open(self.path, 'ab') as f:
+            f.write(data)
+        self.size += len(data)
+    
+    def flush(self):
+        """Anexa os registros pendentes ao diário"""
+        records = self.take_pending()
+        try:
+            self.append(records)
+        except OSError:
+            self.requeue(records)
+            raise
+    
+    def needs_compaction(self):
+        """Indica se o diário deve ser incorporado ao arquivo principal"""
+        if not self.size:
+            return False
+        return (self.size >= self.COMPACT_SIZE or
+                time.time() - self.last_compaction >= self.COMPACT_INTERVAL)
+    
+    def clear(self):
+        """Descarta o diário depois que o arquivo principal foi salvo.
+        Registros pendentes são de edições posteriores ao salvamento e
+        continuam na fila."""
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+        self.size = 0
+        self.last_compaction = time.time()
+    
+    def replay(self, lines):
+        """Reaplica o diário sobre o buffer; retorna True se havia registros"""
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                records = f.read().split('\n')
+        except FileNotFoundError:
+            return False
+        
+        applied = False
+        for record in records:
+            parts = record.split(' ', 3)
+            try:
+                if parts[0] == 'o' and len(parts) == 4:
+                    line_num, col = int(parts[1]), int(parts[2])
+                    while not lines.has_line(line_num):
+                        lines.append("")
+                    lines.overwrite(line_num, col, parts[3])
+                elif parts[0] == 'n' and len(parts) == 2:
+                    while not lines.has_line(int(parts[1])):
+                        lines.append("")
+                else:
+                    continue  # Registro incompleto (gravação interrompida)
+            except ValueError:
+                continue
+            applied = True
+        return applied
+
+class DirectoryWatcher:
+    """
+    Observa um diretório com inotify (Linux), chamado via ctypes.
+    O descritor fd fica legível quando algum arquivo do diretório é gravado,
+    criado, renomeado ou removido.
+    """
+    IN_CLOSE_WRITE = 0x008
+    IN_MOVED_TO = 0x080
+    IN_CREATE = 0x100
+    IN_DELETE = 0x200
+    EVENT_HEADER = struct.Struct('iIII')  # wd, mask, cookie, len
+    
+    def __init__(self, directory):
+        libc = ctypes.CDLL(None, use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify indisponível")
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+        if libc.inotify_add_watch(self.fd, os.fsencode(directory), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self.fd)
+            raise OSError(errno, "não foi possível observar o diretório")
+    
+    def read_names(self):
+        """Lê os eventos pendentes e retorna os nomes dos arquivos afetados"""
+        names = set()
+        while True:
+            try:
+                data = os.read(self.fd, 65536)
+            except BlockingIOError:
+                return names
+            pos = 0
+            while pos + self.EVENT_HEADER.size <= len(data):
+                _, _, _, length = self.EVENT_HEADER.unpack_from(data, pos)
+                pos += self.EVENT_HEADER.size
+                names.add(os.fsdecode(data[pos:pos + length].rstrip(b'\0')))
+                pos += length
+    
+    def close(self):
+        os.close(self.fd)
+
+def file_signature(file_path):
+    """Identifica o estado de um arquivo no disco (None se não existir)"""
+    try:
+        info = os.stat(file_path)
+    except OSError:
+        return None
+    return info.st_ino, info.st_size, info.st_mtime_ns
+
+# Arquivos a partir deste tamanho são abertos com MappedBuffer
+LAZY_LOAD_SIZE = 32 * 1024 * 1024
+
 class CursesTextEditor:
     """
     Editor de texto usando curses que mantém as funcionalidades do editor GUI:
     - Sobrescrita de caracteres
     - Limite de 80 caracteres por linha
-    - Salvamento automático a cada 5 segundos
-    - Navegação apenas com setas
+    - Salvamento automático a cada 5 segundos (em diário de edições), gravado
+      fora do loop a partir de instantâneos do documento
+    - Navegação com setas e salto para linha/porcentagem (Ctrl+G)
     - Quebra de linha apenas no final do documento ou quando linha atinge 80 caracteres
+    
+    Teclado, salvamento automático, redimensionamento do terminal e alterações
+    externas no arquivo são tratados por um único loop asyncio.
     """
+    AUTOSAVE_INTERVAL = 5  # Segundos entre gravações do diário
+    POLL_INTERVAL = 2  # Segundos entre verificações do arquivo sem inotify
+    RESIZE_DELAY = 0.05  # Segundos sem redimensionamentos antes de redesenhar
     
-    def __init__(self, stdscr, initial_file_path=None):
+    def __init__(self, stdscr, initial_file_path=None, buffer_class=ChunkedBuffer):
         self.stdscr = stdscr
-        self.lines = [""]
-        self.cursor_x = 0
-        self.cursor_y = 0
+        self.buffer_class = buffer_class  # buffers.ListBuffer mantém o comportamento de referência
+        # Regras de edição e cursor ficam no documento; o editor só reage às
+        # notificações (diário, redesenho, estado do salvamento)
+        self.document = Document(buffer_class())
+        self.document.subscribe(self.on_document_change)
         self.file_path = initial_file_path
-        self.has_unsaved_changes = False
         self.running = True
+        
+        # Estado do salvamento: cada edição incrementa edit_generation e um
+        # salvamento marca como salva apenas a geração do seu instantâneo
+        self.edit_generation = 0
+        self.saved_generation = 0
+        self.save_lock = asyncio.Lock()  # Serializa as gravações no disco
+        self.saving = 0  # Gravações do próprio editor em curso
+        self.file_signature = None  # Identificação do arquivo após a última gravação
+        self.external_change = False
+        
+        # Estado do loop de eventos
+        self.wakeup = asyncio.Event()  # Há teclas para ler ou a tela mudou
+        self.background = set()  # Tarefas de gravação em curso
+        self.resize_timer = None  # Ajuste de tamanho agendado
         self.scroll_offset = 0
         
+        # Estado do redesenho incremental
+        self.dirty_lines = set()  # Linhas do documento alteradas desde o último render
+        self.full_redraw = True
+        self.last_cursor_y = 0
+        self.last_scroll_offset = 0
+        self.last_status = None
+        
         # Configuração do curses
         stdscr.keypad(True)  # Habilita teclas de função e setas
+        stdscr.idlok(True)  # Permite usar regiões de scroll do terminal
 
         curses.curs_set(2)  # Cursor muito visível (bloco sólido)
         curses.use_default_colors()
@@ -38,9 +235,7 @@ class CursesTextEditor:
         curses.init_pair(4, curses.COLOR_WHITE, curses.COLOR_BLACK)   # Barra de status
         
         # Obtém dimensões da tela
-        self.height, self.width = stdscr.getmaxyx()
-        self.text_height = self.height - 2  # Reserva espaço para status
-        self.text_width = min(self.width, 80)  # Limita a 80 colunas
+        self.update_dimensions()
         
         # Carrega arquivo inicial se fornecido
         if initial_file_path:
@@ -49,143 +244,315 @@ class CursesTextEditor:
             # Cria arquivo com timestamp se não foi fornecido
             timestamp = datetime.now().strftime("%Y-%m-%d-%H-%M-%S")
             self.file_path = f"{timestamp}.txt"
+            self.journal = EditJournal(self.file_path)
             self.save_file()
-        
-        # Inicia thread de salvamento automático
-        self.auto_save_thread = threading.Thread(target=self.auto_save_loop, daemon=True)
-        self.auto_save_thread.start()
+        self.file_signature = file_signature(self.file_path)
+    
+    def update_dimensions(self):
+        """Lê as dimensões da tela e recalcula a área de texto"""
+        self.height, self.width = self.stdscr.getmaxyx()
+        self.text_height = max(self.height - 2, 1)  # Reserva espaço para status
+        self.text_width = min(self.width, 80)  # Limita a 80 colunas
     
     def load_file(self, file_path):
-        """Carrega um arquivo existente"""
+        """Carrega um arquivo existente e reaplica o diário de edições pendente"""
+        self.journal = EditJournal(file_path)
         try:
-            with open(file_path, 'r', encoding='utf-8') as f:
-                content = f.read()
-            self.lines = content.split('\n') if content else [""]
+            if os.path.getsize(file_path) >= LAZY_LOAD_SIZE:
+                # Arquivo enorme: mapeia e carrega as linhas sob demanda
+                self.document.reset(MappedBuffer(file_path))
+                self.lines.start_indexing()
+            else:
+                with open(file_path, 'r', encoding='utf-8') as f:
+                    content = f.read()
+                self.document.reset(self.buffer_class(content.split('\n') if content else [""]))
             self.file_path = file_path
-            self.has_unsaved_changes = False
+            self.journal.replay(self.lines)
         except FileNotFoundError:
-            self.lines = [""]
-            self.has_unsaved_changes = True
+            self.document.reset(self.buffer_class())
+            self.edit_generation += 1
+            self.journal.replay(self.lines)
         except Exception as e:
-            self.lines = [f"Erro ao carregar arquivo: {e}"]
-            self.has_unsaved_changes = True
+            self.document.reset(self.buffer_class([f"Erro ao carregar arquivo: {e}"]))
+            self.edit_generation += 1
+    
+    @property
+    def has_unsaved_changes(self):
+        """Indica se há edições que ainda não chegaram ao disco"""
+        return self.edit_generation != self.saved_generation
+    
+    def mark_saved(self, generation):
+        """Marca como salvas as edições até a geração informada"""
+        self.saved_generation = max(self.saved_generation, generation)
+    
+    def take_snapshot(self):
+        """Retorna um instantâneo do documento, a sua geração e os registros
+        do diário que ele já contém. O instantâneo é barato (cópia na escrita)."""
+        return self.lines.snapshot(), self.edit_generation, self.journal.take_pending()
+    
+    def write_snapshot(self, snapshot, records):
+        """Grava o instantâneo no arquivo; pode rodar fora do loop"""
+        try:
+            # Gravação atômica: um MappedBuffer ainda lê do arquivo original
+            # enquanto o documento é escrito
+            saver.save(self.file_path, snapshot.write_to, binary=snapshot.WRITES_BYTES)
+            self.journal.clear()
+            return True
+        except Exception:
+            # As edições do instantâneo voltam para o diário
+            self.journal.requeue(records)
+            return False
+    
+    def write_journal(self, records):
+        """Anexa registros ao diário; pode rodar fora do loop"""
+        try:
+            self.journal.append(records)
+            return True
+        except OSError:
+            self.journal.requeue(records)
+            return False
+    
+    def finish_save(self, generation):
+        """Registra um salvamento concluído"""
+        self.mark_saved(generation)
+        self.file_signature = file_signature(self.file_path)
+        self.external_change = False
     
     def save_file(self):
-        """Salva o arquivo atual"""
+        """Salva o arquivo atual de forma síncrona (abertura e encerramento)"""
         if not self.file_path:
             return False
         
-        try:
-            content = '\n'.join(self.lines)
-            with open(self.file_path, 'w', encoding='utf-8') as f:
-                f.write(content)
-            self.has_unsaved_changes = False
-            return True
-        except Exception as e:
+        snapshot, generation, records = self.take_snapshot()
+        if not self.write_snapshot(snapshot, records):
             return False
+        self.finish_save(generation)
+        return True
+    
+    async def save_in_background(self):
+        """Salva o arquivo numa thread auxiliar; o teclado nunca espera pelo disco"""
+        if not self.file_path:
+            return False
+        
+        snapshot, generation, records = self.take_snapshot()
+        loop = asyncio.get_running_loop()
+        self.saving += 1
+        try:
+            async with self.save_lock:
+                saved = await loop.run_in_executor(None, self.write_snapshot, snapshot, records)
+            if saved:
+                self.finish_save(generation)
+        finally:
+            self.saving -= 1
+        self.wakeup.set()  # Atualiza a barra de status
+        return saved
     
-    def auto_save_loop(self):
-        """Loop de salvamento automático executado em thread separada"""
+    async def flush_journal(self):
+        """Grava no diário as edições feitas até agora"""
+        records = self.journal.take_pending()
+        generation = self.edit_generation
+        loop = asyncio.get_running_loop()
+        async with self.save_lock:
+            written = await loop.run_in_executor(None, self.write_journal, records)
+        if written:
+            self.mark_saved(generation)
+            self.wakeup.set()
+        return written
+    
+    def spawn(self, coroutine):
+        """Executa uma gravação no loop e a mantém até terminar"""
+        task = asyncio.get_running_loop().create_task(coroutine)
+        self.background.add(task)
+        task.add_done_callback(self.background.discard)
+    
+    def request_save(self):
+        """Inicia o salvamento do arquivo sem bloquear o teclado"""
+        self.spawn(self.save_in_background())
+    
+    async def autosave_loop(self):
+        """A cada 5 segundos grava o diário de edições e compacta no arquivo
+        quando necessário."""
         while self.running:
-            time.sleep(5)
-            if self.has_unsaved_changes and self.file_path:
-                self.save_file()
-    
-    def get_current_line(self):
-        """Retorna a linha atual"""
-        if 0 <= self.cursor_y < len(self.lines):
-            return self.lines[self.cursor_y]
-        return ""
-    
-    def set_current_line(self, text):
-        """Define o conteúdo da linha atual"""
-        while len(self.lines) <= self.cursor_y:
-            self.lines.append("")
-        self.lines[self.cursor_y] = text
+            await asyncio.sleep(self.AUTOSAVE_INTERVAL)
+            if not self.file_path:
+                continue
+            await self.flush_journal()
+            if self.journal.needs_compaction() or not os.path.exists(self.file_path):
+                await self.save_in_background()
     
-    def handle_printable_char(self, char):
-        """Manipula caracteres imprimíveis com sobrescrita e limite de linha"""
-        current_line = self.get_current_line()
-        
-        # Verifica limite de 80 caracteres
-        if self.cursor_x >= 80:
+    def check_external_change(self):
+        """Verifica se o arquivo foi alterado por outro programa"""
+        if self.saving:
+            return  # Gravação do próprio editor; a identificação é atualizada ao final
+        signature = file_signature(self.file_path)
+        if signature != self.file_signature:
+            self.file_signature = signature
+            self.external_change = True
+            self.wakeup.set()
+    
+    async def watch_file(self):
+        """Observa alterações externas no arquivo com inotify ou, na falta dele,
+        verificando o arquivo periodicamente"""
+        # Os salvamentos substituem o destino de um link simbólico
+        real_path = os.path.realpath(self.file_path)
+        try:
+            watcher = DirectoryWatcher(os.path.dirname(real_path))
+        except (OSError, AttributeError):
+            while self.running:
+                await asyncio.sleep(self.POLL_INTERVAL)
+                self.check_external_change()
             return
         
-        # Sobrescrita: substitui caractere na posição atual
-        if self.cursor_x < len(current_line):
-            new_line = current_line[:self.cursor_x] + char + current_line[self.cursor_x + 1:]
-        else:
-            # Adiciona caractere no final da linha
-            new_line = current_line + ' ' * (self.cursor_x - len(current_line)) + char
-        
-        self.set_current_line(new_line)
-        self.cursor_x += 1
-        self.has_unsaved_changes = True
+        loop = asyncio.get_running_loop()
+        changed = asyncio.Event()
+        loop.add_reader(watcher.fd, changed.set)
+        name = os.path.basename(real_path)
+        try:
+            while self.running:
+                await changed.wait()
+                changed.clear()
+                if name in watcher.read_names():
+                    self.check_external_change()
+        finally:
+            loop.remove_reader(watcher.fd)
+            watcher.close()
     
-    def handle_enter(self):
-        """Manipula a tecla Enter conforme regras específicas"""
-        current_line = self.get_current_line()
-        
-        # Permite quebra de linha apenas:
-        # 1. No final do documento
-        # 2. Quando a linha atual atingiu 80 caracteres
-        
-        is_last_line = self.cursor_y == len(self.lines) - 1
-        line_at_limit = len(current_line) >= 80
+    async def watch_indexing(self):
+        """Atualiza a barra de status enquanto o índice é construído"""
+        while self.running and self.lines.indexing_progress() < 1:
+            await asyncio.sleep(0.5)
+            self.wakeup.set()
+        self.wakeup.set()
+    
+    def handle_resize(self):
+        """Agrupa uma rajada de redimensionamentos (SIGWINCH ou KEY_RESIZE)
+        num único ajuste da tela, feito quando os eventos param de chegar"""
+        if self.resize_timer:
+            self.resize_timer.cancel()
+        loop = asyncio.get_running_loop()
+        self.resize_timer = loop.call_later(self.RESIZE_DELAY, self.apply_resize)
+    
+    def apply_resize(self):
+        """Ajusta a tela ao tamanho atual do terminal mantendo o cursor na
+        mesma linha da tela; nenhuma linha do documento é reformatada"""
+        self.resize_timer = None
+        try:
+            columns, rows = os.get_terminal_size(sys.__stdout__.fileno())
+            if (rows, columns) != self.stdscr.getmaxyx():
+                curses.resizeterm(rows, columns)  # Com KEY_RESIZE o curses já ajustou
+        except (OSError, curses.error):
+            pass
         
-        if is_last_line and self.cursor_x >= len(current_line):
-            # Estamos no final da última linha - cria nova linha
-            self.lines.append("")
-            self.cursor_y += 1
-            self.cursor_x = 0
-            self.has_unsaved_changes = True
-        elif line_at_limit:
-            # Linha atingiu 80 caracteres - vai para próxima linha ou cria nova
-            if self.cursor_y + 1 < len(self.lines):
-                self.cursor_y += 1
-                self.cursor_x = 0
-            else:
-                self.lines.append("")
-                self.cursor_y += 1
-                self.cursor_x = 0
-                self.has_unsaved_changes = True
+        cursor_row = self.cursor_y - self.scroll_offset
+        self.update_dimensions()
+        cursor_row = min(max(cursor_row, 0), self.text_height - 1)
+        self.scroll_offset = max(self.cursor_y - cursor_row, 0)
+        self.invalidate()
+        self.wakeup.set()
+    
+    @property
+    def lines(self):
+        return self.document.lines
+    
+    @property
+    def cursor_x(self):
+        return self.document.col
+    
+    @property
+    def cursor_y(self):
+        return self.document.line
+    
+    def on_document_change(self, event, *args):
+        """Registra no diário e marca para redesenho as mudanças do documento"""
+        if event == STRUCK:
+            line_num, col, char = args
+            self.journal.record_overwrite(line_num, col, char)
+        elif event == LINE_ADDED:
+            line_num, = args
+            self.journal.record_newline(line_num)
         else:
-            # Move cursor para o final da linha atual ou início da próxima
-            if self.cursor_x < len(current_line):
-                self.cursor_x = len(current_line)
-            elif self.cursor_y + 1 < len(self.lines):
-                self.cursor_y += 1
-                self.cursor_x = 0
+            return  # Movimento do cursor: o render compara com a posição anterior
+        self.edit_generation += 1
+        self.mark_dirty(line_num)
+    
+    def handle_printable_char(self, char):
+        """Manipula caracteres imprimíveis com sobrescrita e limite de linha"""
+        self.document.strike(char)
+    
+    def handle_enter(self):
+        """Manipula a tecla Enter conforme as regras do documento"""
+        self.document.carriage_return()
     
     def handle_backspace(self):
         """Move cursor para trás sem apagar"""
-        if self.cursor_x > 0:
-            self.cursor_x -= 1
-        elif self.cursor_y > 0:
-            self.cursor_y -= 1
-            self.cursor_x = len(self.get_current_line())
+        self.document.move_left()
     
     def handle_delete(self):
         """Move cursor para frente sem apagar"""
-        current_line = self.get_current_line()
-        if self.cursor_x < len(current_line):
-            self.cursor_x += 1
-        elif self.cursor_y + 1 < len(self.lines):
-            self.cursor_y += 1
-            self.cursor_x = 0
+        self.document.move_right()
     
     def handle_arrow_keys(self, key):
         """Manipula as teclas de seta"""
-        if key == curses.KEY_UP and self.cursor_y > 0:
-            self.cursor_y -= 1
-            self.cursor_x = min(self.cursor_x, len(self.get_current_line()))
-        elif key == curses.KEY_DOWN and self.cursor_y < len(self.lines) - 1:
-            self.cursor_y += 1
-            self.cursor_x = min(self.cursor_x, len(self.get_current_line()))
+        if key == curses.KEY_UP:
+            self.document.move_up()
+        elif key == curses.KEY_DOWN:
+            self.document.move_down()
         elif key == curses.KEY_LEFT:
-            self.handle_backspace()
+            self.document.move_left()
         elif key == curses.KEY_RIGHT:
-            self.handle_delete()
+            self.document.move_right()
+    
+    async def read_key(self):
+        """Aguarda a próxima tecla sem bloquear o loop de eventos"""
+        while True:
+            self.stdscr.timeout(0)
+            key = self.stdscr.getch()
+            if key != -1:
+                return key
+            self.wakeup.clear()
+            await self.wakeup.wait()
+    
+    async def prompt(self, message):
+        """Lê uma resposta curta na linha acima da barra de status.
+        Retorna None se o usuário cancelar com Esc."""
+        answer = ""
+        while True:
+            try:
+                self.stdscr.addstr(self.height - 2, 0, (message + answer)[:self.width - 1].ljust(self.width - 1))
+            except curses.error:
+                pass
+            self.stdscr.refresh()
+            key = await self.read_key()
+            if key in (ord('\n'), ord('\r'), curses.KEY_ENTER):
+                break
+            elif key == 27:  # Esc
+                answer = None
+                break
+            elif key in (curses.KEY_BACKSPACE, ord('\b'), 127):
+                answer = answer[:-1]
+            elif 32 <= key <= 126:
+                answer += chr(key)
+        
+        try:
+            self.stdscr.move(self.height - 2, 0)
+            self.stdscr.clrtoeol()
+        except curses.error:
+            pass
+        return answer
+    
+    async def handle_goto(self):
+        """Pergunta a linha ou a porcentagem do documento e salta para ela"""
+        answer = await self.prompt("Ir para linha (ou N%): ")
+        if not answer:
+            return
+        try:
+            if answer.endswith('%'):
+                percent = min(max(float(answer[:-1]), 0), 100)
+                self.document.goto_line(self.lines.line_at_fraction(percent / 100))
+            else:
+                self.document.goto_line(int(answer) - 1)
+        except ValueError:
+            pass  # Resposta inválida: mantém o cursor
     
     def adjust_scroll(self):
         """Ajusta o scroll para manter o cursor visível"""
@@ -194,15 +561,29 @@ class CursesTextEditor:
         elif self.cursor_y >= self.scroll_offset + self.text_height:
             self.scroll_offset = self.cursor_y - self.text_height + 1
     
-    def render_screen(self):
-        """Renderiza a tela completa"""
-        self.adjust_scroll()
-        self.stdscr.clear()
-        
-        # Renderiza linhas visíveis
-        for i in range(self.text_height):
-            line_num = self.scroll_offset + i
-            if line_num < len(self.lines):
+    def mark_dirty(self, line_num):
+        """Marca uma linha do documento para ser redesenhada"""
+        self.dirty_lines.add(line_num)
+    
+    def invalidate(self):
+        """Força o redesenho completo da tela no próximo render"""
+        self.full_redraw = True
+    
+    def scroll_text_area(self, delta):
+        """Desloca a área de texto usando a região de scroll do terminal"""
+        self.stdscr.setscrreg(0, self.text_height - 1)
+        self.stdscr.scrollok(True)
+        try:
+            self.stdscr.scroll(delta)
+        finally:
+            self.stdscr.scrollok(False)
+            self.stdscr.setscrreg(0, self.height - 1)
+    
+    def draw_text_row(self, row):
+        """Desenha uma linha da área de texto"""
+        line_num = self.scroll_offset + row
+        try:
+            if self.lines.has_line(line_num):
                 line = self.lines[line_num]
                 display_line = line[:self.text_width]
                 
@@ -217,22 +598,74 @@ class CursesTextEditor:
                     else:
                         color = 0  # Normal
                 
-                try:
-                    self.stdscr.addstr(i, 0, display_line.ljust(self.text_width), color)
-                except curses.error:
-                    pass  # Ignora erros de desenho fora da tela
+                self.stdscr.addstr(row, 0, display_line.ljust(self.text_width), color)
+            else:
+                self.stdscr.move(row, 0)
+                self.stdscr.clrtoeol()
+        except curses.error:
+            pass  # Ignora erros de desenho fora da tela
+    
+    def damaged_rows(self):
+        """Calcula as linhas da tela que precisam ser redesenhadas"""
+        if self.full_redraw:
+            return set(range(self.text_height))
+        
+        rows = set()
+        delta = self.scroll_offset - self.last_scroll_offset
+        if delta:
+            if abs(delta) < self.text_height:
+                # Reaproveita o conteúdo já na tela e desenha só as linhas expostas
+                self.scroll_text_area(delta)
+                if delta > 0:
+                    rows.update(range(self.text_height - delta, self.text_height))
+                else:
+                    rows.update(range(-delta))
+            else:
+                return set(range(self.text_height))
+        
+        # Linhas editadas e as linhas antiga/nova do cursor (destaque)
+        for line_num in self.dirty_lines | {self.last_cursor_y, self.cursor_y}:
+            row = line_num - self.scroll_offset
+            if 0 <= row < self.text_height:
+                rows.add(row)
+        return rows
+    
+    def render_screen(self):
+        """Renderiza apenas as partes da tela que mudaram desde o último render"""
+        if self.height < 2:
+            return  # Terminal pequeno demais para o texto e a barra de status
+        self.adjust_scroll()
+        if self.full_redraw:
+            self.stdscr.clear()
+        
+        for row in self.damaged_rows():
+            self.draw_text_row(row)
         
         # Renderiza barra de status
         status = f"Arquivo: {os.path.basename(self.file_path) if self.file_path else 'Novo'} | "
         status += f"Lin: {self.cursor_y + 1}, Col: {self.cursor_x + 1} | "
         status += f"{'*' if self.has_unsaved_changes else 'Salvo'} | "
+        if self.external_change:
+            status += "Alterado fora do editor | "
+        progress = self.lines.indexing_progress()
+        if progress < 1:
+            status += f"Indexando: {int(progress * 100)}% | "
         status += "Ctrl+Q: Sair, Ctrl+S: Salvar"
         
-        try:
-            self.stdscr.addstr(self.height - 1, 0, status[:self.width].ljust(self.width), 
-                             curses.color_pair(4) | curses.A_REVERSE)
-        except curses.error:
-            pass
+        if self.full_redraw or status != self.last_status:
+            try:
+                # insstr não avança o cursor, então escrever a última célula
+                # da tela não gera erro
+                self.stdscr.insstr(self.height - 1, 0, status[:self.width].ljust(self.width),
+                                   curses.color_pair(4) | curses.A_REVERSE)
+            except curses.error:
+                pass
+            self.last_status = status
+        
+        self.dirty_lines.clear()
+        self.full_redraw = False
+        self.last_cursor_y = self.cursor_y
+        self.last_scroll_offset = self.scroll_offset
         
         # Posiciona cursor
         screen_y = self.cursor_y - self.scroll_offset
@@ -247,55 +680,124 @@ class CursesTextEditor:
             except curses.error:
                 pass
         
-        self.stdscr.refresh()
+        self.stdscr.noutrefresh()
+        curses.doupdate()
     
-    def run(self):
-        """Loop principal do editor"""
-        while self.running:
-            self.render_screen()
-            
-            try:
-                key = self.stdscr.getch()
-                
-                # Ctrl+Q (ASCII 17)
-                if key == 17:  # Ctrl+Q
-                    if self.has_unsaved_changes:
-                        # Simples confirmação
-                        self.stdscr.addstr(self.height - 2, 0, "Pressione 'y' para sair sem salvar ou qualquer tecla para continuar...")
-                        self.stdscr.refresh()
-                        confirm = self.stdscr.getch()
-                        if confirm == ord('y') or confirm == ord('Y'):
-                            self.running = False
-                    else:
-                        self.running = False
-                
-                # Ctrl+S (ASCII 19)
-                elif key == 19:  # Ctrl+S
-                    self.save_file()
-                
-                elif key == ord('\n') or key == ord('\r') or key == curses.KEY_ENTER:  # Enter
-                    self.handle_enter()
-                
-                elif key == curses.KEY_BACKSPACE or key == ord('\b') or key == 127:  # Backspace
-                    self.handle_backspace()
-                
-                elif key == curses.KEY_DC:  # Delete
-                    self.handle_delete()
-                
-                elif key in [curses.KEY_UP, curses.KEY_DOWN, curses.KEY_LEFT, curses.KEY_RIGHT]:
-                    self.handle_arrow_keys(key)
+    # Teclas que pedem confirmação ou uma resposta ao usuário: encerram o lote
+    # para que a resposta seja lida do terminal, e não do próprio lote
+    INTERACTIVE_KEYS = (17, 7)  # Ctrl+Q, Ctrl+G
+    MAX_BATCH = 4096  # Teclas aplicadas antes de redesenhar a tela
+    
+    def read_keys(self):
+        """Lê, sem bloquear, todas as teclas que já estão na fila do terminal
+        (por exemplo, um texto colado)"""
+        keys = []
+        self.stdscr.timeout(0)
+        while len(keys) < self.MAX_BATCH:
+            key = self.stdscr.getch()
+            if key == -1:
+                break
+            keys.append(key)
+            if key in self.INTERACTIVE_KEYS:
+                break
+        return keys
+    
+    async def handle_key(self, key):
+        """Aplica uma tecla ao documento"""
+        # Ctrl+Q (ASCII 17)
+        if key == 17:  # Ctrl+Q
+            if self.has_unsaved_changes:
+                # Simples confirmação
+                self.stdscr.addstr(self.height - 2, 0, "Pressione 'y' para sair sem salvar ou qualquer tecla para continuar...")
+                self.stdscr.refresh()
+                confirm = await self.read_key()
+                if confirm == ord('y') or confirm == ord('Y'):
+                    self.running = False
+                self.invalidate()  # Remove a mensagem de confirmação
+            else:
+                self.running = False
+        
+        # Ctrl+S (ASCII 19)
+        elif key == 19:  # Ctrl+S
+            self.request_save()
+        
+        # Ctrl+G (ASCII 7)
+        elif key == 7:  # Ctrl+G
+            await self.handle_goto()
+        
+        elif key == ord('\n') or key == ord('\r') or key == curses.KEY_ENTER:  # Enter
+            self.handle_enter()
+        
+        elif key == curses.KEY_BACKSPACE or key == ord('\b') or key == 127:  # Backspace
+            self.handle_backspace()
+        
+        elif key == curses.KEY_DC:  # Delete
+            self.handle_delete()
+        
+        elif key in [curses.KEY_UP, curses.KEY_DOWN, curses.KEY_LEFT, curses.KEY_RIGHT]:
+            self.handle_arrow_keys(key)
+        
+        elif key == curses.KEY_RESIZE:  # Terminal redimensionado
+            self.handle_resize()
+        
+        elif 32 <= key <= 126:  # Caracteres imprimíveis ASCII
+            self.handle_printable_char(chr(key))
+    
+    async def run_async(self):
+        """Loop principal do editor: aplica as teclas em lotes e redesenha a
+        tela uma vez por lote; os demais eventos só pedem um novo redesenho"""
+        loop = asyncio.get_running_loop()
+        stdin = sys.stdin.fileno()
+        loop.add_reader(stdin, self.wakeup.set)
+        try:
+            loop.add_signal_handler(signal.SIGWINCH, self.handle_resize)
+        except (AttributeError, NotImplementedError, RuntimeError):
+            pass  # Sem SIGWINCH (Windows)
+        services = [loop.create_task(service) for service in
+                    (self.autosave_loop(), self.watch_file(), self.watch_indexing())]
+        
+        try:
+            while self.running:
+                self.render_screen()
+                await self.wakeup.wait()
+                self.wakeup.clear()
                 
-                elif 32 <= key <= 126:  # Caracteres imprimíveis ASCII
-                    self.handle_printable_char(chr(key))
+                try:
+                    keys = self.read_keys()
+                except curses.error:
+                    continue  # Ignora erros de curses
+                if len(keys) == self.MAX_BATCH:
+                    self.wakeup.set()  # Ainda há teclas na fila
                 
-            except KeyboardInterrupt:
-                self.running = False
-            except curses.error:
-                pass  # Ignora erros de curses
+                for key in keys:
+                    if not self.running:
+                        break
+                    try:
+                        await self.handle_key(key)
+                    except curses.error:
+                        pass  # Ignora erros de curses
+        finally:
+            loop.remove_reader(stdin)
+            if hasattr(signal, 'SIGWINCH'):
+                loop.remove_signal_handler(signal.SIGWINCH)
+            for service in services:
+                service.cancel()
+            await asyncio.gather(*services, return_exceptions=True)
+            # Salvamentos em curso terminam antes do encerramento
+            await asyncio.gather(*self.background, return_exceptions=True)
+    
+    def run(self):
+        """Executa o editor até o usuário sair"""
+        try:
+            asyncio.run(self.run_async())
+        except KeyboardInterrupt:
+            self.running = False
     
     def cleanup(self):
-        """Limpa recursos"""
+        """Limpa recursos e incorpora o diário de edições ao arquivo"""
         self.running = False
+        if not self.has_unsaved_changes and self.journal.size:
+            self.save_file()
 
 def main_curses(stdscr):
     """Função principal que roda dentro do curses"""